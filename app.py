@@ -1,14 +1,224 @@
 import sys
 import os
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
     QWidget, QPushButton, QLabel, QFileDialog, QComboBox,
-    QProgressBar, QTextEdit, QMessageBox, QGroupBox
+    QProgressBar, QTextEdit, QMessageBox, QGroupBox, QListView, QCheckBox
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QFont, QIcon
-from final_excel_processor import process_excel_file
+from PyQt6.QtCore import (
+    Qt, QThread, pyqtSignal, QObject, QRunnable, QThreadPool,
+    QAbstractListModel, QModelIndex, QSize
+)
+from PyQt6.QtGui import QFont, QIcon, QPixmap, QImage, QImageReader, QColor, QBrush
+from final_excel_processor import (
+    process_excel_file, read_schedule_ids, build_image_index, resolve_image,
+    default_profile_dir, PreflightError
+)
+from pdf_optimizer import DEFAULT_PDF_QUALITY
+from renderers import shutdown_default_pool
+
+
+THUMBNAIL_SIZE = QSize(96, 96)
+
+
+class PixmapCache:
+    """In-memory LRU cache of thumbnail pixmaps, shared by all thumbnail models"""
+    
+    def __init__(self, max_items: int = 512):
+        """
+        Initialize the cache
+        
+        Args:
+            max_items (int): Number of pixmaps kept before the least recently used is dropped
+        """
+        self.max_items = max_items
+        self._items: "OrderedDict[str, QPixmap]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[QPixmap]:
+        """Return the cached pixmap for key, marking it as recently used"""
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+    
+    def put(self, key: str, pixmap: QPixmap) -> None:
+        """Store a pixmap, evicting the least recently used entries if full"""
+        self._items[key] = pixmap
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+thumbnail_cache = PixmapCache()
+
+
+class ThumbnailSignals(QObject):
+    """Signals emitted by ThumbnailLoader (QRunnable cannot emit signals itself)"""
+    
+    loaded = pyqtSignal(str, QImage)  # image_path, scaled image (null on failure)
+
+
+class ThumbnailLoader(QRunnable):
+    """Decode and scale one image on the thread pool"""
+    
+    def __init__(self, image_path: str, size: QSize, signals: ThumbnailSignals):
+        """
+        Initialize the loader
+        
+        Args:
+            image_path (str): Path to the image file
+            size (QSize): Bounding box of the thumbnail
+            signals (ThumbnailSignals): Signals used to hand the image back to the GUI thread
+        """
+        super().__init__()
+        self.image_path = image_path
+        self.size = size
+        self.signals = signals
+    
+    def run(self) -> None:
+        """Read the image scaled down at decode time"""
+        reader = QImageReader(self.image_path)
+        reader.setAutoTransform(True)
+        original_size = reader.size()
+        if original_size.isValid():
+            # Let the decoder scale (much cheaper than decoding full size for JPEGs)
+            reader.setScaledSize(original_size.scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        self.signals.loaded.emit(self.image_path, image)
+
+
+class ScheduleSignals(QObject):
+    """Signals emitted by ScheduleLoader"""
+    
+    loaded = pyqtSignal(list)  # [(sheet_id, image_path, kind), ...]
+    failed = pyqtSignal(str)
+
+
+class ScheduleLoader(QRunnable):
+    """Read the Schedule IDs and match them against the image directory in the background"""
+    
+    def __init__(self, excel_file_path: str, img_dir: str):
+        """
+        Initialize the loader
+        
+        Args:
+            excel_file_path (str): Path to the Excel file
+            img_dir (str): Path to the image directory
+        """
+        super().__init__()
+        self.excel_file_path = excel_file_path
+        self.img_dir = img_dir
+        self.signals = ScheduleSignals()
+    
+    def run(self) -> None:
+        """Load the Schedule IDs and resolve each one to an image"""
+        try:
+            sheet_ids = read_schedule_ids(self.excel_file_path)
+            image_index = build_image_index(self.img_dir)
+            entries = []
+            for sheet_id in sheet_ids:
+                image_path, kind = resolve_image(sheet_id, self.img_dir, image_index)
+                entries.append((sheet_id, image_path, kind))
+            self.signals.loaded.emit(entries)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
+
+class ThumbnailModel(QAbstractListModel):
+    """List model of Schedule IDs whose thumbnails are loaded when the view first asks for them"""
+    
+    KIND_COLORS = {
+        'dimensions': QColor("#fff8e1"),
+        'fallback': QColor("#ffe0b2"),
+        'missing': QColor("#ffcdd2"),
+    }
+    
+    def __init__(self, parent: Optional[QObject] = None):
+        """Initialize an empty model with its own thread pool"""
+        super().__init__(parent)
+        self.entries: List[Tuple[str, Optional[str], str]] = []
+        self.rows_by_path: Dict[str, List[int]] = {}
+        self.pending: Set[str] = set()
+        self.request_counter = 0
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount() // 2))
+        self.signals = ThumbnailSignals()
+        self.signals.loaded.connect(self.on_thumbnail_loaded)
+        self.placeholder = QPixmap(THUMBNAIL_SIZE)
+        self.placeholder.fill(QColor("#eeeeee"))
+    
+    def set_entries(self, entries: List[Tuple[str, Optional[str], str]]) -> None:
+        """Replace the model contents and drop any queued thumbnail loads"""
+        self.beginResetModel()
+        self.thread_pool.clear()
+        self.pending.clear()
+        self.entries = entries
+        self.rows_by_path = {}
+        for row, (_, image_path, _) in enumerate(entries):
+            if image_path:
+                self.rows_by_path.setdefault(image_path, []).append(row)
+        self.endResetModel()
+    
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        """Return the number of Schedule IDs"""
+        return 0 if parent.isValid() else len(self.entries)
+    
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        """Return display data; only rows the view paints ever request a thumbnail"""
+        if not index.isValid():
+            return None
+        sheet_id, image_path, kind = self.entries[index.row()]
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            return sheet_id
+        if role == Qt.ItemDataRole.DecorationRole:
+            if not image_path:
+                return self.placeholder
+            pixmap = thumbnail_cache.get(image_path)
+            if pixmap is None:
+                self.request_thumbnail(image_path)
+                return self.placeholder
+            return pixmap
+        if role == Qt.ItemDataRole.BackgroundRole:
+            color = self.KIND_COLORS.get(kind)
+            return QBrush(color) if color else None
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if kind == 'missing':
+                return f"{sheet_id}: no image found"
+            if kind == 'fallback':
+                return f"{sheet_id}: using fallback {os.path.basename(image_path)}"
+            return f"{sheet_id}: {image_path}"
+        return None
+    
+    def request_thumbnail(self, image_path: str) -> None:
+        """Queue a thumbnail load; newer requests (the rows on screen now) run first"""
+        if image_path in self.pending:
+            return
+        self.pending.add(image_path)
+        self.request_counter += 1
+        loader = ThumbnailLoader(image_path, THUMBNAIL_SIZE, self.signals)
+        self.thread_pool.start(loader, self.request_counter)
+    
+    def on_thumbnail_loaded(self, image_path: str, image: QImage) -> None:
+        """Cache the loaded thumbnail and repaint every row that uses it"""
+        self.pending.discard(image_path)
+        # QPixmap may only be created on the GUI thread
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else self.placeholder
+        thumbnail_cache.put(image_path, pixmap)
+        for row in self.rows_by_path.get(image_path, []):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+    
+    def summary(self) -> str:
+        """Return a one-line count of images, fallbacks and missing images"""
+        counts = {'image': 0, 'dimensions': 0, 'fallback': 0, 'missing': 0}
+        for _, _, kind in self.entries:
+            counts[kind] += 1
+        return (f"{len(self.entries)} fixtures: {counts['image']} with image, "
+                f"{counts['dimensions']} dimensions only, {counts['fallback']} fallback, "
+                f"{counts['missing']} missing")
 
 
 class ProcessingThread(QThread):
@@ -17,7 +227,8 @@ class ProcessingThread(QThread):
     progress_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str, str)  # success, message, pdf_path
     
-    def __init__(self, excel_file_path: str, language: str, img_dir: str):
+    def __init__(self, excel_file_path: str, language: str, img_dir: str,
+                 profile_dir: Optional[str] = None, pdf_quality: Optional[str] = DEFAULT_PDF_QUALITY):
         """
         Initialize the processing thread
         
@@ -25,17 +236,24 @@ class ProcessingThread(QThread):
             excel_file_path (str): Path to the Excel file to process
             language (str): Language code ('EN' or 'DE')
             img_dir (str): Path to the image directory
+            profile_dir (Optional[str]): Folder for profiling reports, None to disable profiling
+            pdf_quality (Optional[str]): PDF optimisation preset, None to skip optimisation
         """
         super().__init__()
         self.excel_file_path = excel_file_path
         self.language = language
         self.img_dir = img_dir
+        self.profile_dir = profile_dir
+        self.pdf_quality = pdf_quality
     
     def run(self) -> None:
         """Run the Excel processing in a separate thread"""
         try:
             self.progress_signal.emit("Starting Excel processing...")
-            result = process_excel_file(self.excel_file_path, self.language, self.img_dir)
+            if self.profile_dir:
+                self.progress_signal.emit(f"Profiling enabled, reports will be written to a timestamped folder under: {self.profile_dir}")
+            result = process_excel_file(self.excel_file_path, self.language, self.img_dir,
+                                        self.profile_dir, self.pdf_quality)
             
             if result and isinstance(result, str):
                 # Success - result is the PDF path
@@ -44,6 +262,10 @@ class ProcessingThread(QThread):
                 # Failure - result is False
                 self.finished_signal.emit(False, "Processing failed. Check the console for details.", "")
                 
+        except PreflightError as e:
+            # Show which rows failed, not just that something did
+            self.progress_signal.emit(e.report.summary())
+            self.finished_signal.emit(False, str(e), "")
         except Exception as e:
             self.finished_signal.emit(False, f"Error during processing: {str(e)}", "")
 
@@ -58,12 +280,13 @@ class ExcelProcessorApp(QMainWindow):
         self.selected_img_dir: Optional[str] = None
         self.processing_thread: Optional[ProcessingThread] = None
         self.pdf_path: Optional[str] = None
+        self.schedule_signals: Optional[ScheduleSignals] = None
         self.init_ui()
     
     def init_ui(self) -> None:
         """Initialize the user interface"""
         self.setWindowTitle("Lighting Specifications Generator")
-        self.setGeometry(100, 100, 600, 750)
+        self.setGeometry(100, 100, 700, 750)
         
         # Create central widget and main layout
         central_widget = QWidget()
@@ -145,6 +368,53 @@ class ExcelProcessorApp(QMainWindow):
         
         main_layout.addWidget(language_group)
         
+        # Options group
+        options_group = QGroupBox("Options")
+        options_layout = QVBoxLayout(options_group)
+        
+        self.profile_checkbox = QCheckBox("Profile this run (writes timing and memory reports next to the Excel file)")
+        options_layout.addWidget(self.profile_checkbox)
+        
+        # PDF optimisation preset
+        pdf_quality_layout = QHBoxLayout()
+        pdf_quality_layout.addWidget(QLabel("PDF quality:"))
+        self.pdf_quality_combo = QComboBox()
+        self.pdf_quality_combo.addItem("Screen (96 dpi, smallest)", "screen")
+        self.pdf_quality_combo.addItem("Tablet / e-mail (150 dpi)", "ebook")
+        self.pdf_quality_combo.addItem("Print (300 dpi)", "print")
+        self.pdf_quality_combo.addItem("Lossless (no downsampling)", "lossless")
+        self.pdf_quality_combo.addItem("Off (unoptimised Excel export)", None)
+        self.pdf_quality_combo.setCurrentIndex(self.pdf_quality_combo.findData(DEFAULT_PDF_QUALITY))
+        pdf_quality_layout.addWidget(self.pdf_quality_combo, 1)
+        options_layout.addLayout(pdf_quality_layout)
+        
+        main_layout.addWidget(options_group)
+        
+        # Fixture overview group
+        overview_group = QGroupBox("Fixture Overview")
+        overview_layout = QVBoxLayout(overview_group)
+        
+        self.overview_label = QLabel("Select an Excel file and image directory to preview fixtures")
+        overview_layout.addWidget(self.overview_label)
+        
+        # Virtualised grid: with uniform item sizes the view only queries visible rows
+        self.thumbnail_model = ThumbnailModel(self)
+        self.thumbnail_view = QListView()
+        self.thumbnail_view.setModel(self.thumbnail_model)
+        self.thumbnail_view.setViewMode(QListView.ViewMode.IconMode)
+        self.thumbnail_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.thumbnail_view.setMovement(QListView.Movement.Static)
+        self.thumbnail_view.setUniformItemSizes(True)
+        self.thumbnail_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.thumbnail_view.setBatchSize(200)
+        self.thumbnail_view.setIconSize(THUMBNAIL_SIZE)
+        self.thumbnail_view.setGridSize(QSize(THUMBNAIL_SIZE.width() + 24, THUMBNAIL_SIZE.height() + 30))
+        # One row minimum; more rows scroll instead of growing the window past small screens
+        self.thumbnail_view.setMinimumHeight(THUMBNAIL_SIZE.height() + 40)
+        overview_layout.addWidget(self.thumbnail_view)
+        
+        main_layout.addWidget(overview_group)
+        
         # Process button
         self.process_button = QPushButton("Process Excel File")
         self.process_button.clicked.connect(self.process_file)
@@ -289,6 +559,7 @@ class ExcelProcessorApp(QMainWindow):
             self.file_path_label.setText(f"Selected: {os.path.basename(file_path)}")
             self.update_process_button_state()
             self.log_message(f"File selected: {file_path}")
+            self.refresh_fixture_overview()
     
     def browse_image_directory(self) -> None:
         """Open directory dialog to select image directory"""
@@ -303,6 +574,7 @@ class ExcelProcessorApp(QMainWindow):
             self.img_path_label.setText(f"Selected: {os.path.basename(img_dir)}")
             self.update_process_button_state()
             self.log_message(f"Image directory selected: {img_dir}")
+            self.refresh_fixture_overview()
     
     def update_process_button_state(self) -> None:
         """Update the process button enabled state based on selections"""
@@ -311,6 +583,38 @@ class ExcelProcessorApp(QMainWindow):
             self.selected_img_dir is not None
         )
     
+    def refresh_fixture_overview(self) -> None:
+        """Reload the fixture grid in the background once both file and image directory are set"""
+        if not self.selected_file_path or not self.selected_img_dir:
+            return
+        
+        self.overview_label.setText("Loading fixtures...")
+        loader = ScheduleLoader(self.selected_file_path, self.selected_img_dir)
+        # Results from an older selection that finish after a newer one are ignored
+        self.schedule_signals = loader.signals
+        loader.signals.loaded.connect(self.on_schedule_loaded)
+        loader.signals.failed.connect(self.on_schedule_failed)
+        QThreadPool.globalInstance().start(loader)
+    
+    def on_schedule_loaded(self, entries: list) -> None:
+        """Fill the fixture grid with the loaded Schedule IDs"""
+        if self.sender() is not self.schedule_signals:
+            return
+        self.thumbnail_model.set_entries(entries)
+        self.overview_label.setText(self.thumbnail_model.summary())
+        missing = [sheet_id for sheet_id, _, kind in entries if kind in ('fallback', 'missing')]
+        if missing:
+            self.log_message(f"{len(missing)} fixtures without their own image: {', '.join(missing[:20])}"
+                             + (" ..." if len(missing) > 20 else ""))
+    
+    def on_schedule_failed(self, error: str) -> None:
+        """Report a failure to read the Schedule sheet"""
+        if self.sender() is not self.schedule_signals:
+            return
+        self.thumbnail_model.set_entries([])
+        self.overview_label.setText("Could not read fixtures from the Schedule sheet")
+        self.log_message(f"Error reading Schedule: {error}")
+    
     def process_file(self) -> None:
         """Start processing the selected Excel file"""
         if not self.selected_file_path:
@@ -341,8 +645,14 @@ class ExcelProcessorApp(QMainWindow):
         self.status_text.clear()
         self.log_message(f"Starting processing with language: {language}")
         
+        # Profiling reports go to a folder next to the Excel file
+        profile_dir = None
+        if self.profile_checkbox.isChecked():
+            profile_dir = default_profile_dir(self.selected_file_path)
+        
         # Create and start processing thread
-        self.processing_thread = ProcessingThread(self.selected_file_path, language, self.selected_img_dir)
+        self.processing_thread = ProcessingThread(self.selected_file_path, language, self.selected_img_dir,
+                                                  profile_dir, self.pdf_quality_combo.currentData())
         self.processing_thread.progress_signal.connect(self.log_message)
         self.processing_thread.finished_signal.connect(self.on_processing_finished)
         self.processing_thread.start()
@@ -438,12 +748,16 @@ class ExcelProcessorApp(QMainWindow):
             )
             
             if reply == QMessageBox.StandardButton.Yes:
+                # Kill the busy Excel first: the terminated thread would never release it
+                shutdown_default_pool()
                 self.processing_thread.terminate()
                 self.processing_thread.wait()
                 event.accept()
             else:
                 event.ignore()
         else:
+            # Quit the Excel instance kept alive between runs
+            shutdown_default_pool()
             event.accept()
 
 
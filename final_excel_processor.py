@@ -1,13 +1,26 @@
-from typing import List
+from typing import List, Optional
 import openpyxl
 from openpyxl import load_workbook
 from openpyxl.drawing.image import Image
+from openpyxl.worksheet.copier import WorksheetCopy
+from openpyxl.worksheet.worksheet import Worksheet
+import argparse
 import os
 import sys
-import win32com.client
 import re
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
+from pdf_optimizer import DEFAULT_PDF_QUALITY, PDF_QUALITIES, optimize_pdf
+from profiling import NULL_PROFILER, RunProfiler
+from renderers import RENDERERS, create_pool, get_default_pool
+
+MAX_SHEET_NAME_LENGTH = 31
+
+# Sheets that Schedule IDs must never overwrite
+PROTECTED_SHEETS = ["Schedule", "Cover", "GenInfo+Contacts"]
 
 def create_backup(excel_file_path):
     """Create a backup copy of the original file"""
@@ -23,30 +36,107 @@ def create_backup(excel_file_path):
         return None
 
 
-def add_image_to_sheet(sheet, sheet_id, img_dir):
+def clean_sheet_id(value):
+    """Strip characters Excel does not allow in sheet names from an ID"""
+    return re.sub(r'[\[\]*?/\\:;]', '', str(value).strip()).strip()
+
+
+def read_schedule(schedule_sheet):
+    """
+    Read the Schedule sheet in a single pass
+
+    Returns (column_names, rows): column names come from row 9 and rows is a
+    list of (row_num, row_data) for every row from 11 on, blank rows included.
+    """
+    header = next(schedule_sheet.iter_rows(min_row=9, max_row=9, values_only=True), ())
+    column_names = {index: str(cell_value).strip() for index, cell_value in enumerate(header) if cell_value}
+
+    rows = []
+    for row_num, values in enumerate(schedule_sheet.iter_rows(min_row=11, values_only=True), start=11):
+        row_data = {name: values[index] if index < len(values) else None
+                    for index, name in column_names.items()}
+        rows.append((row_num, row_data))
+    return column_names, rows
+
+
+def is_blank(cell_value):
+    """Return True for empty or whitespace-only cell values"""
+    return cell_value is None or str(cell_value).strip() == ''
+
+
+def schedule_rows_until_blank(rows):
+    """Return the Schedule rows up to (not including) the first row with a blank ID"""
+    for position, (_, row_data) in enumerate(rows):
+        if is_blank(row_data.get("ID")):
+            return rows[:position]
+    return rows
+
+
+def read_schedule_ids(excel_file_path):
+    """Read the cleaned IDs from the Schedule sheet without loading the whole workbook"""
+    wb = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        if 'Schedule' not in wb.sheetnames:
+            print("Schedule sheet not found")
+            return []
+
+        column_names, rows = read_schedule(wb['Schedule'])
+        if "ID" not in column_names.values():
+            print("ID column not found in Schedule sheet")
+            return []
+
+        return [clean_sheet_id(row_data["ID"]) for _, row_data in schedule_rows_until_blank(rows)]
+    finally:
+        wb.close()
+
+
+def build_image_index(img_dir):
+    """Scan the image directory once and return the set of file names it contains"""
+    try:
+        with os.scandir(img_dir) as entries:
+            return {os.path.normcase(entry.name) for entry in entries if entry.is_file()}
+    except OSError as e:
+        print(f"Warning: Could not read image directory {img_dir}: {e}")
+        return set()
+
+
+def resolve_image(sheet_id, img_dir, image_index=None):
+    """
+    Find the image to use for a sheet ID
+
+    Returns a (image_path, kind) tuple where kind is 'image', 'dimensions',
+    'fallback' or 'missing'. image_path is None when nothing was found.
+    Pass an index from build_image_index() to avoid one stat per candidate.
+    """
+    candidates = [
+        (f"{sheet_id}_image.jpg", 'image'),
+        (f"{sheet_id}_dimensions.jpg", 'dimensions'),
+        ("_no_image.jpg", 'fallback'),
+        ("_blank.jpg", 'fallback'),
+    ]
+    for file_name, kind in candidates:
+        if image_index is not None:
+            found = os.path.normcase(file_name) in image_index
+        else:
+            found = os.path.exists(os.path.join(img_dir, file_name))
+        if found:
+            return os.path.join(img_dir, file_name), kind
+    return None, 'missing'
+
+
+def add_image_to_sheet(sheet, sheet_id, img_dir, image_index=None):
     """Add image to sheet based on sheet ID"""
     try:
-        image_path = os.path.join(img_dir, f"{sheet_id}_image.jpg")
-        
-        # Check if image exists
-        if not os.path.exists(image_path):
-            print(f"Warning: Image not found for {sheet_id}: {image_path}")
-            # Try alternative image paths
-            alternative_paths = [
-                os.path.join(img_dir, f"{sheet_id}_dimensions.jpg"),
-                os.path.join(img_dir, "_no_image.jpg"),
-                os.path.join(img_dir, "_blank.jpg")
-            ]
-            
-            for alt_path in alternative_paths:
-                if os.path.exists(alt_path):
-                    image_path = alt_path
-                    print(f"Using alternative image: {alt_path}")
-                    break
-            else:
+        image_path, kind = resolve_image(sheet_id, img_dir, image_index)
+
+        if kind != 'image':
+            print(f"Warning: Image not found for {sheet_id}: "
+                  f"{os.path.join(img_dir, f'{sheet_id}_image.jpg')}")
+            if image_path is None:
                 print(f"No suitable image found for {sheet_id}")
                 return False
-        
+            print(f"Using alternative image: {image_path}")
+
         # Load and insert image
         img = Image(image_path)
         
@@ -85,62 +175,341 @@ def add_image_to_sheet(sheet, sheet_id, img_dir):
         print(f"Error adding image for {sheet_id}: {e}")
         return False
 
-def create_sheets(wb, excel_file_path, language, img_dir):
-    """Create sheets directly from Schedule sheet data using openpyxl"""
+class SheetIndex:
+    """
+    Case-insensitive name -> sheet index, kept in step with the workbook
+
+    wb.sheetnames builds a new list on every call, so membership tests
+    against it make sheet creation quadratic in the number of sheets.
+    Chartsheets are included, because their names are taken as well.
+    """
+
+    def __init__(self, wb):
+        self._sheets = {sheet.title.lower(): sheet for sheet in wb._sheets}
+
+    def __contains__(self, name):
+        return name.lower() in self._sheets
+
+    def get(self, name):
+        return self._sheets.get(name.lower())
+
+    def add(self, sheet):
+        self._sheets[sheet.title.lower()] = sheet
+
+    def pop(self, name):
+        return self._sheets.pop(name.lower())
+
+    def names(self):
+        return [sheet.title for sheet in self._sheets.values()]
+
+
+def map_sheet_names(sheet_ids, reserved_names=()):
+    """
+    Map cleaned IDs to unique sheet names, in Schedule order
+
+    IDs longer than 31 characters are truncated. A name that collides
+    (case-insensitively, as in Excel) with an earlier name or a reserved
+    sheet gets a "~2", "~3", ... suffix. The first occurrence always keeps
+    its name, so the mapping is stable for a given Schedule. Empty IDs map
+    to None. IDs that are equal after clean-up are rejected by the
+    pre-flight checks, so in practice only truncated IDs and reserved names
+    are suffixed.
+    """
+    taken = {name.lower() for name in reserved_names}
+    sheet_names = []
+    for sheet_id in sheet_ids:
+        if not sheet_id:
+            sheet_names.append(None)
+            continue
+        sheet_name = sheet_id[:MAX_SHEET_NAME_LENGTH]
+        counter = 2
+        while sheet_name.lower() in taken:
+            suffix = f"~{counter}"
+            sheet_name = sheet_id[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+            counter += 1
+        taken.add(sheet_name.lower())
+        sheet_names.append(sheet_name)
+    return sheet_names
+
+
+def protected_sheet_names(sheet_names):
+    """Return the sheets in the workbook that generated sheets must not replace"""
+    return PROTECTED_SHEETS + [name for name in sheet_names if name.startswith("Template_")]
+
+
+def remove_sheets(wb, sheets):
+    """Remove several sheets in one pass (each wb.remove() call scans the sheet list)"""
+    removed = {id(sheet) for sheet in sheets}
+    wb._sheets = [sheet for sheet in wb._sheets if id(sheet) not in removed]
+
+
+def new_detached_sheet(wb, title):
+    """
+    Create a worksheet that belongs to wb but is not in its sheet list yet
+
+    openpyxl's title setter rebuilds and scans the list of every sheet name
+    to avoid duplicates, which makes creating n sheets quadratic. Titles
+    from map_sheet_names() are already unique and valid, so the check is
+    skipped by creating the sheet without a parent first.
+
+    This relies on openpyxl internals (hence the <3.2 pin in pyproject.toml)
+    and fails loudly if they change.
+    """
+    sheet = Worksheet(parent=None)
+    sheet._parent = wb
+    sheet._WorkbookChild__title = title
+    if sheet.title != title or not isinstance(wb._sheets, list):
+        raise RuntimeError(f"Unsupported openpyxl version {openpyxl.__version__}: cannot create sheets directly")
+    return sheet
+
+
+def append_sheets(wb, sheets):
+    """Add the generated sheets, in Schedule order, after all other sheets in one step"""
+    active_sheet = wb.active
+    wb._sheets.extend(sheets)
+    if active_sheet in wb._sheets:
+        wb.active = wb._sheets.index(active_sheet)
+    else:
+        wb.active = 0
+
+
+@dataclass
+class PreflightIssue:
+    """A single problem found by the pre-flight checks"""
+    check: str
+    severity: str  # 'error' rejects the job, 'warning' is only reported
+    message: str
+    row: Optional[int] = None
+    sheet_id: Optional[str] = None
+
+
+@dataclass
+class PreflightReport:
+    """Result of run_preflight()"""
+    issues: List[PreflightIssue] = field(default_factory=list)
+    row_count: int = 0
+    duration: float = 0.0
+    # Parsed once here and reused by create_sheets()
+    schedule_rows: list = field(default_factory=list, repr=False)
+    image_index: Optional[set] = field(default=None, repr=False)
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == 'error']
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue.severity == 'warning']
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def summary(self, max_issues=50):
+        """Return a printable multi-line summary of the report (errors are listed first)"""
+        lines = [f"Pre-flight checked {self.row_count} rows in {self.duration * 1000:.0f} ms: "
+                 f"{len(self.errors)} errors, {len(self.warnings)} warnings"]
+        for issue in self.issues[:max_issues]:
+            location = f" (row {issue.row})" if issue.row else ""
+            lines.append(f"  [{issue.severity.upper()}] {issue.check}{location}: {issue.message}")
+        if len(self.issues) > max_issues:
+            lines.append(f"  ... and {len(self.issues) - max_issues} more")
+        return "\n".join(lines)
+
+
+class PreflightError(Exception):
+    """Raised by process_excel_file() when the pre-flight checks reject a job"""
+
+    def __init__(self, report):
+        super().__init__("Pre-flight checks failed, nothing was changed")
+        self.report = report
+
+
+def _check_required_sheets(sheetnames, language):
+    """Template and Schedule sheets must both exist"""
+    issues = []
+    template_sheet_name = f'Template_{language}'
+    if template_sheet_name not in sheetnames:
+        issues.append(PreflightIssue('required_sheets', 'error', f"Template sheet '{template_sheet_name}' not found"))
+    if 'Schedule' not in sheetnames:
+        issues.append(PreflightIssue('required_sheets', 'error', "Schedule sheet not found"))
+    return issues
+
+
+def _check_ids(rows, reserved_names):
+    """IDs must be non-empty and unique after clean-up; renamed sheets are reported"""
+    issues = []
+    sheet_ids = [clean_sheet_id(row_data["ID"]) for _, row_data in rows]
+    sheet_names = map_sheet_names(sheet_ids, reserved_names)
+    first_use_by_id = {}
+    for (row_num, row_data), sheet_id, sheet_name in zip(rows, sheet_ids, sheet_names):
+        raw_id = str(row_data["ID"]).strip()
+        if not sheet_id:
+            issues.append(PreflightIssue('ids', 'error', f"ID '{raw_id}' is empty after removing invalid characters",
+                                         row_num, sheet_id))
+            continue
+        # Both sheets would get the same selection value, i.e. identical pages.
+        # Excel sheet names are case-insensitive, so 'lc-01' clashes with 'LC-01'
+        key = sheet_id.lower()
+        if key in first_use_by_id:
+            first_row, first_raw_id = first_use_by_id[key]
+            detail = "" if raw_id == first_raw_id else f" (same as '{first_raw_id}' after clean-up)"
+            issues.append(PreflightIssue('ids', 'error',
+                                         f"Duplicate ID '{raw_id}'{detail}, first used in row {first_row}",
+                                         row_num, sheet_id))
+            continue
+        first_use_by_id[key] = (row_num, raw_id)
+        if sheet_name != sheet_id:
+            if len(sheet_id) > MAX_SHEET_NAME_LENGTH:
+                reason = f"is {len(sheet_id)} characters long (limit {MAX_SHEET_NAME_LENGTH})"
+            else:
+                reason = "is the name of a reserved sheet"
+            issues.append(PreflightIssue('ids', 'warning',
+                                         f"ID '{raw_id}' {reason}, its sheet will be named '{sheet_name}'",
+                                         row_num, sheet_id))
+    return issues
+
+
+def _check_blank_rows(all_rows, schedule_rows):
+    """A blank ID must not be followed by more IDs, which would be silently dropped"""
+    if len(schedule_rows) == len(all_rows):
+        return []
+    blank_row_num = all_rows[len(schedule_rows)][0]
+    dropped = [(row_num, row_data) for row_num, row_data in all_rows[len(schedule_rows) + 1:]
+               if not is_blank(row_data.get("ID"))]
+    if not dropped:
+        return []
+    dropped_ids = ", ".join(str(row_data["ID"]).strip() for _, row_data in dropped[:10])
+    more = " ..." if len(dropped) > 10 else ""
+    return [PreflightIssue('blank_rows', 'error',
+                           f"Blank ID cuts the schedule short; {len(dropped)} IDs after it would be "
+                           f"ignored: {dropped_ids}{more}", blank_row_num)]
+
+
+def _check_images(rows, img_dir, image_index):
+    """Every ID should have its own image; fallbacks are reported, no image at all is an error"""
+    issues = []
+    for row_num, row_data in rows:
+        sheet_id = clean_sheet_id(row_data["ID"])
+        image_path, kind = resolve_image(sheet_id, img_dir, image_index)
+        if kind == 'missing':
+            issues.append(PreflightIssue('images', 'error', f"No image and no fallback image for '{sheet_id}'",
+                                         row_num, sheet_id))
+        elif kind == 'fallback':
+            issues.append(PreflightIssue('images', 'warning',
+                                         f"No image for '{sheet_id}', using {os.path.basename(image_path)}",
+                                         row_num, sheet_id))
+    return issues
+
+
+def run_preflight(wb, language, img_dir):
+    """
+    Validate the workbook, Schedule and image directory before any heavy work
+
+    The checks are independent and run concurrently over one parsed copy of
+    the Schedule and one scan of the image directory.
+    """
+    start = time.perf_counter()
+    report = PreflightReport()
+
+    report.issues.extend(_check_required_sheets(wb.sheetnames, language))
+    if 'Schedule' in wb.sheetnames:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Parsing the Schedule and scanning the image directory do not depend on each other
+            schedule_future = executor.submit(read_schedule, wb['Schedule'])
+            index_future = executor.submit(build_image_index, img_dir)
+            column_names, all_rows = schedule_future.result()
+            image_index = index_future.result()
+        report.image_index = image_index
+
+        if "ID" not in column_names.values():
+            report.issues.append(PreflightIssue('required_sheets', 'error', "ID column not found in Schedule sheet"))
+        else:
+            schedule_rows = schedule_rows_until_blank(all_rows)
+            report.schedule_rows = schedule_rows
+            report.row_count = len(schedule_rows)
+            if not schedule_rows:
+                report.issues.append(PreflightIssue('ids', 'error', "Schedule contains no IDs"))
+
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(_check_ids, schedule_rows, protected_sheet_names(wb.sheetnames)),
+                    executor.submit(_check_blank_rows, all_rows, schedule_rows),
+                    executor.submit(_check_images, schedule_rows, img_dir, image_index),
+                ]
+                for future in futures:
+                    report.issues.extend(future.result())
+
+    report.issues.sort(key=lambda issue: (issue.severity != 'error', issue.row or 0))
+    report.duration = time.perf_counter() - start
+    return report
+
+
+def create_sheets(wb, excel_file_path, language, img_dir, profiler=NULL_PROFILER, schedule_rows=None,
+                  image_index=None):
+    """
+    Create sheets directly from Schedule sheet data using openpyxl
+
+    Returns (sheet_names, saved_path), or False on failure. saved_path is
+    excel_file_path, or a "_modified_" copy when the workbook could not be
+    saved in place (usually because it is open in Excel). schedule_rows and
+    image_index can be passed from a PreflightReport to avoid parsing the
+    Schedule and scanning the image directory again.
+    """
     template_sheet_name = f'Template_{language}'
+    sheet_index = SheetIndex(wb)
     
-    if template_sheet_name not in wb.sheetnames:
+    if template_sheet_name not in sheet_index:
         print("Template sheet not found")
         return False
     
-    if 'Schedule' not in wb.sheetnames:
+    if 'Schedule' not in sheet_index:
         print("Schedule sheet not found")
         return False
     
+    generated_sheets = []
+    all_sheets_created = False
     try:
         # Get the template sheet
-        template_sheet = wb[template_sheet_name]
+        template_sheet = sheet_index.get(template_sheet_name)
         
         # Get the Schedule sheet
-        schedule_sheet = wb['Schedule']
+        schedule_sheet = sheet_index.get('Schedule')
         sheets_created = 0
+        if image_index is None:
+            image_index = build_image_index(img_dir)
         
-        # Get column names from row 9
-        column_names = {}
-        for col_num in range(1, schedule_sheet.max_column + 1):
-            cell_value = schedule_sheet.cell(row=9, column=col_num).value
-            if cell_value:
-                column_names[col_num] = str(cell_value).strip()
+        if schedule_rows is None:
+            # Read column names (row 9) and data rows (from row 11) in one pass
+            column_names, rows = read_schedule(schedule_sheet)
+            print(f"Found columns: {list(column_names.values())}")
+            
+            # Stop at the first blank ID
+            schedule_rows = schedule_rows_until_blank(rows)
+        rows = schedule_rows
+        sheet_ids = [clean_sheet_id(row_data["ID"]) for _, row_data in rows]
+        sheet_names = map_sheet_names(sheet_ids, protected_sheet_names(sheet_index.names()))
         
-        print(f"Found columns: {list(column_names.values())}")
+        # Sheets left over from a previous run are deleted and recreated
+        existing_sheets = [sheet_index.pop(name) for name in sheet_names if name and name in sheet_index]
+        if existing_sheets:
+            print(f"Deleting {len(existing_sheets)} existing sheets to recreate them...")
+            remove_sheets(wb, existing_sheets)
         
-        # Process each row in the Schedule sheet starting from row 11
-        sheet_ids = []
-        for row_num in range(11, schedule_sheet.max_row + 1):
-            # Get all values for this row
-            row_data = {}
-            for col_num in column_names.keys():
-                cell_value = schedule_sheet.cell(row=row_num, column=col_num).value
-                row_data[column_names[col_num]] = cell_value
+        try:
+            for (row_num, row_data), sheet_id, sheet_name in zip(rows, sheet_ids, sheet_names):
+                if sheet_name is None:
+                    print(f"Skipping row {row_num}: ID is empty after removing invalid characters")
+                    continue
             
-            cell_value = row_data.get("ID")
+                print(f"Creating sheet: {sheet_name}")
+                print(f"Row data: {row_data}")
             
-            if cell_value is None or str(cell_value).strip() == '':
-                # Stop when we encounter a blank value
-                break
+                # Copy the template sheet straight into a sheet with its final name
+                new_sheet = new_detached_sheet(wb, sheet_name)
+                WorksheetCopy(template_sheet, new_sheet).copy_worksheet()
+                sheet_index.add(new_sheet)
             
-            value_str = str(cell_value).strip()
-            # Clean invalid characters
-            sheet_id = re.sub(r'[\[\]*?/\\:;]', '', value_str).strip()
-            sheet_ids.append(sheet_id)
-            if sheet_id and len(sheet_id) <= 31 and sheet_id not in wb.sheetnames:
-                print(f"Creating sheet: {sheet_id}")
-                print(f"Row data: {row_data}")
-                
-                # Copy the template sheet
-                new_sheet = wb.copy_worksheet(template_sheet)
-                new_sheet.title = sheet_id
-                
                 # Try to update cells that contain lighting component patterns
                 for row in new_sheet.iter_rows(min_row=1, max_row=50, min_col=1, max_col=20):
                     for cell in row:
@@ -151,46 +520,24 @@ def create_sheets(wb, excel_file_path, language, img_dir):
                     else:
                         continue
                     break
-                
-                # Add image to the sheet
-                add_image_to_sheet(new_sheet, sheet_id, img_dir)
-                
-                sheets_created += 1
-            elif sheet_id in wb.sheetnames:
-                print(f"Sheet {sheet_id} already exists, deleting and recreating...")
-                # Remove the existing sheet
-                wb.remove(wb[sheet_id])
-                print(f"Deleted existing sheet: {sheet_id}")
-                
-                # Create the new sheet (this will now execute the code below)
-                print(f"Creating sheet: {sheet_id}")
-                print(f"Row data: {row_data}")
-                
-                # Copy the template sheet
-                new_sheet = wb.copy_worksheet(template_sheet)
-                new_sheet.title = sheet_id
-                
-                # Try to update cells that contain lighting component patterns
-                for row in new_sheet.iter_rows(min_row=1, max_row=50, min_col=1, max_col=20):
-                    for cell in row:
-                        if cell.value and any(pattern in str(cell.value) for pattern in ['LC-', 'LW-', 'LT-', 'LJ-']):
-                            cell.value = sheet_id
-                            print(f"Set selection cell to: {sheet_id}")
-                            break
-                    else:
-                        continue
-                    break
-                
+            
                 # Add image to the sheet
-                add_image_to_sheet(new_sheet, sheet_id, img_dir)
-                
+                with profiler.stage("add_image_to_sheet"):
+                    add_image_to_sheet(new_sheet, sheet_id, img_dir, image_index)
+            
+                generated_sheets.append(new_sheet)
                 sheets_created += 1
+        finally:
+            # Put the generated sheets in Schedule order (also keeps them if a row failed)
+            append_sheets(wb, generated_sheets)
+        all_sheets_created = True
         
         # Save the workbook
-        wb.save(excel_file_path)
+        with profiler.stage("save"):
+            wb.save(excel_file_path)
         print(f"Created {sheets_created} new sheets")
         print("Workbook saved successfully")
-        return sheet_ids
+        return [sheet.title for sheet in generated_sheets], excel_file_path
         
     except Exception as e:
         print(f"Error creating sheets: {e}")
@@ -203,82 +550,74 @@ def create_sheets(wb, excel_file_path, language, img_dir):
         try:
             wb.save(new_path)
             print(f"Workbook saved as: {new_path}")
-            return new_path
         except Exception as e2:
             print(f"Error saving to new path: {e2}")
             return False
+        if not all_sheets_created:
+            # The copy keeps the partial work, but it is not a result to render
+            return False
+        return [sheet.title for sheet in generated_sheets], new_path
+
+def create_pdf(excel_file_path, sheet_ids: List[str], render_pool=None, profile=None):
+    """
+    Create PDF from all sheets using a pooled renderer (Excel by default)
 
-def create_pdf(excel_file_path, sheet_ids: List[str]):
-    """Create PDF from all sheets"""
+    profile is an optional cProfile.Profile for the export on the renderer thread
+    """
     output_pdf = os.path.splitext(excel_file_path)[0] + "_output.pdf"
     if os.path.exists(output_pdf):
         os.remove(output_pdf)
     print(f"Creating PDF: {output_pdf}")
     
     try:
-        # Use Excel automation
-        excel_app = win32com.client.Dispatch("Excel.Application")
-        excel_app.Visible = False
-        excel_app.DisplayAlerts = False
-        
-        # Open workbook
-        workbook = excel_app.Workbooks.Open(os.path.abspath(excel_file_path))
-
         # Define sheets to include in PDF export
         sheets_to_include = ["Cover", "GenInfo+Contacts"]
         sheets_to_include = sheets_to_include + sheet_ids
         
         print(f"Sheets to include in PDF: {sheets_to_include}")
         
-        # Hide sheets that should not be included in PDF
-        for sheet in workbook.Sheets:
-            if sheet.Name not in sheets_to_include:
-                sheet.Visible = False
-                print(f"Hidden sheet: {sheet.Name}")
-        
-        # Export to PDF (only visible sheets will be included)
-        workbook.ExportAsFixedFormat(
-            Type=0,  # PDF
-            Filename=os.path.abspath(output_pdf),
-            Quality=0,
-            IncludeDocProperties=True,
-            IgnorePrintAreas=False,
-            OpenAfterPublish=False
-        )
-        
-        # Make all sheets visible again
-        for sheet in workbook.Sheets:
-            sheet.Visible = True
-        
-        # Clean up
-        workbook.Close(SaveChanges=False)
-        excel_app.Quit()
+        pool = render_pool or get_default_pool()
+        pool.export_pdf(os.path.abspath(excel_file_path), os.path.abspath(output_pdf), sheets_to_include,
+                        profile)
         
         print(f"PDF created successfully: {output_pdf}")
         return output_pdf
         
     except Exception as e:
         print(f"Error creating PDF: {e}")
-        try:
-            if 'workbook' in locals():
-                workbook.Close(SaveChanges=False)
-            if 'excel_app' in locals():
-                excel_app.Quit()
-        except:
-            pass
         return False
 
-def process_excel_file(excel_file_path, language, img_dir):
-    """Main processing function"""
+
+def process_excel_file(excel_file_path, language, img_dir, profile_dir=None, pdf_quality=DEFAULT_PDF_QUALITY,
+                       render_pool=None):
+    """
+    Main processing function
+
+    Returns the PDF path, or False on failure. Raises PreflightError, which
+    carries the report, when the pre-flight checks reject the job.
+
+    Pass profile_dir to write cProfile/tracemalloc reports for each stage
+    to a timestamped folder inside it. pdf_quality selects one of
+    PDF_QUALITIES for the PDF optimisation step, None skips it.
+    render_pool defaults to the shared Excel renderer pool, so repeated
+    calls reuse the same Excel instance.
+    """
+    profiler = RunProfiler(profile_dir) if profile_dir else NULL_PROFILER
+    try:
+        return _process_excel_file(excel_file_path, language, img_dir, profiler, pdf_quality, render_pool)
+    finally:
+        profiler.finish()
+
+
+def _process_excel_file(excel_file_path, language, img_dir, profiler, pdf_quality, render_pool):
     print("Starting Excel processing and PDF creation...")
     print("=" * 50)
     
-    # Create backup
-    backup_path = create_backup(excel_file_path)
-    
     # Load workbook
+    wb = None
     try:
-        wb = load_workbook(excel_file_path)
+        with profiler.stage("load"):
+            wb = load_workbook(excel_file_path)
         print(f"Loaded workbook: {excel_file_path}")
     except Exception as e:
         print(f"Error loading workbook: {e}")
@@ -286,28 +625,83 @@ def process_excel_file(excel_file_path, language, img_dir):
     if wb is None:
         return False
     
+    # Reject invalid jobs before backing up, cloning or rendering anything
+    with profiler.stage("preflight"):
+        report = run_preflight(wb, language, img_dir)
+    print(report.summary())
+    if not report.ok:
+        error = PreflightError(report)
+        print(error)
+        raise error
+    
+    # Create backup
+    backup_path = create_backup(excel_file_path)
+    
     # Create sheets
-    sheet_ids = create_sheets(wb, excel_file_path, language, img_dir)
-    if not sheet_ids:
+    with profiler.stage("create_sheets"):
+        created = create_sheets(wb, excel_file_path, language, img_dir, profiler, report.schedule_rows,
+                                report.image_index)
+    if not created:
         return False
+    sheet_names, saved_path = created
     
     # Create PDF
-    pdf_path = create_pdf(excel_file_path, sheet_ids)
+    with profiler.stage("create_pdf"):
+        # Render the file the sheets were actually saved to
+        pdf_path = create_pdf(saved_path, sheet_names, render_pool, profiler.thread_profile())
     if not pdf_path:
         return False
     
+    # Shrink the PDF; the unoptimised file is still a valid result
+    if pdf_quality:
+        try:
+            with profiler.stage("optimize_pdf"):
+                result = optimize_pdf(pdf_path, pdf_quality)
+            print(result.summary())
+        except Exception as e:
+            print(f"Warning: Could not optimise PDF, keeping the unoptimised file: {e}")
+    
     print("=" * 50)
     print("Processing completed successfully!")
-    print(f"Modified Excel file: {excel_file_path}")
-    print(f"PDF output: {os.path.splitext(excel_file_path)[0]}_output.pdf")
+    print(f"Modified Excel file: {saved_path}")
+    print(f"PDF output: {pdf_path}")
     if backup_path:
         print(f"Backup created: {backup_path}")
     return pdf_path
 
 
+def default_profile_dir(excel_file_path):
+    """Folder next to the Excel file where profiling runs are stored"""
+    return os.path.splitext(excel_file_path)[0] + "_profile"
+
+
 if __name__ == "__main__":
     excel_file = r"C:\Users\aelnagar\Downloads\Lighting Computational Development\Lighting Computational Development\Specifications - BAM example\Bauphase.xlsx"
     img_dir = r"C:\Users\aelnagar\Downloads\Lighting Computational Development\Lighting Computational Development\Specifications - BAM example\img"
     #excel_file = r"C:\Users\aelnagar\Downloads\Lighting Computational Development\Bauphase.xlsm"
     language = "EN"
-    process_excel_file(excel_file, language, img_dir) 
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Generate lighting specification sheets and PDF")
+    parser.add_argument("excel_file", nargs="?", default=excel_file, help="Excel file to process")
+    parser.add_argument("--img-dir", default=img_dir, help="Directory containing the fixture images")
+    parser.add_argument("--language", default=language, choices=["EN", "DE"], help="Template language")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                        help="Write per-stage cProfile/tracemalloc reports (default DIR: <excel file>_profile)")
+    parser.add_argument("--pdf-quality", default=DEFAULT_PDF_QUALITY, choices=list(PDF_QUALITIES) + ["off"],
+                        help="Image resolution/compression used when optimising the PDF, 'off' to skip")
+    parser.add_argument("--renderer", default="excel", choices=list(RENDERERS),
+                        help="PDF backend; 'stub' writes a placeholder PDF without Excel")
+    args = parser.parse_args()
+
+    profile_dir = None
+    if args.profile is not None:
+        profile_dir = args.profile or default_profile_dir(args.excel_file)
+    pdf_quality = None if args.pdf_quality == "off" else args.pdf_quality
+    render_pool = create_pool(args.renderer)
+    try:
+        process_excel_file(args.excel_file, args.language, args.img_dir, profile_dir, pdf_quality, render_pool)
+    except PreflightError:
+        # The report has already been printed
+        sys.exit(1)
+    finally:
+        render_pool.close()
@@ -0,0 +1,290 @@
+"""
+Post-processing for the PDF exported by Excel
+
+Excel's ExportAsFixedFormat writes every image at full resolution, often
+embeds the same image once per page and does not use object streams.
+optimize_pdf() rewrites the file in place:
+
+1. identical images are merged into a single object
+2. images drawn at more than the target DPI are downsampled
+3. streams are recompressed and packed into object streams
+4. the file is linearised ("fast web view") so viewers can show the first
+   pages before the whole file has been read
+"""
+import hashlib
+import io
+import math
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+import pikepdf
+from pikepdf import Name, PdfImage
+from PIL import Image as PILImage
+
+
+@dataclass(frozen=True)
+class PdfQuality:
+    """Quality-vs-size trade-off used by optimize_pdf()"""
+    name: str
+    target_dpi: Optional[int]  # None never downsamples
+    jpeg_quality: int
+
+
+PDF_QUALITIES = {
+    "screen": PdfQuality("screen", 96, 60),
+    "ebook": PdfQuality("ebook", 150, 75),
+    "print": PdfQuality("print", 300, 90),
+    "lossless": PdfQuality("lossless", None, 95),
+}
+
+DEFAULT_PDF_QUALITY = "print"
+
+# Only downsample when it shrinks the image noticeably
+DOWNSAMPLE_THRESHOLD = 1.2
+
+
+@dataclass
+class OptimizationResult:
+    """Sizes and counts reported by optimize_pdf()"""
+    original_size: int
+    optimized_size: int
+    duration: float
+    duplicate_images: int = 0
+    downsampled_images: int = 0
+
+    @property
+    def saved_bytes(self):
+        return self.original_size - self.optimized_size
+
+    @property
+    def saved_percent(self):
+        return 100.0 * self.saved_bytes / self.original_size if self.original_size else 0.0
+
+    def summary(self):
+        change = "smaller" if self.saved_bytes >= 0 else "larger"
+        return (f"PDF optimised in {self.duration:.1f} s: {self.original_size / 1048576:.1f} MiB -> "
+                f"{self.optimized_size / 1048576:.1f} MiB ({abs(self.saved_percent):.0f}% {change}), "
+                f"{self.duplicate_images} duplicate images merged, "
+                f"{self.downsampled_images} images downsampled")
+
+
+def _is_image(obj):
+    return isinstance(obj, pikepdf.Stream) and obj.get("/Subtype") == Name.Image
+
+
+def _image_key(image):
+    """Hash of everything that determines how an image is drawn"""
+    digest = hashlib.sha256(image.read_raw_bytes())
+    for key in ("/Width", "/Height", "/BitsPerComponent", "/ColorSpace", "/Filter",
+                "/DecodeParms", "/Decode", "/ImageMask", "/SMask", "/Mask"):
+        value = image.get(key)
+        if isinstance(value, pikepdf.Stream):
+            # Soft masks are deduplicated first, so identity is enough here
+            digest.update(repr(value.objgen).encode())
+        else:
+            digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+def _xobject_dicts(pdf):
+    """Yield every /XObject resource dictionary of the pages and their form XObjects"""
+    seen = set()
+    pending = [page.obj for page in pdf.pages]
+    while pending:
+        owner = pending.pop()
+        resources = owner.get("/Resources")
+        if resources is None or "/XObject" not in resources:
+            continue
+        xobjects = resources.XObject
+        if xobjects.is_indirect:
+            if xobjects.objgen in seen:
+                continue
+            seen.add(xobjects.objgen)
+        yield xobjects
+        for name in list(xobjects.keys()):
+            xobject = xobjects[name]
+            if (isinstance(xobject, pikepdf.Stream) and xobject.get("/Subtype") == Name.Form
+                    and xobject.objgen not in seen):
+                seen.add(xobject.objgen)
+                pending.append(xobject)
+
+
+def dedupe_images(pdf):
+    """Point every reference to an identical image at one shared object; returns the number merged"""
+    # Masks first, so images that use identical masks also hash the same
+    canonical_masks = {}
+    for xobjects in list(_xobject_dicts(pdf)):
+        for name in list(xobjects.keys()):
+            image = xobjects[name]
+            if _is_image(image) and isinstance(image.get("/SMask"), pikepdf.Stream):
+                key = _image_key(image.SMask)
+                image.SMask = canonical_masks.setdefault(key, image.SMask)
+
+    canonical = {}
+    merged = set()
+    for xobjects in _xobject_dicts(pdf):
+        for name in list(xobjects.keys()):
+            image = xobjects[name]
+            if not _is_image(image):
+                continue
+            key = _image_key(image)
+            original = canonical.setdefault(key, image)
+            if original.objgen != image.objgen:
+                xobjects[name] = original
+                merged.add(image.objgen)
+    return len(merged)
+
+
+def _multiply(m1, m2):
+    """Multiply two PDF matrices [a b c d e f]"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2)
+
+
+def image_display_sizes(pdf):
+    """
+    Return {image objgen: (width_in, height_in)}, the largest size each image is drawn at
+
+    Follows the q/Q/cm operators of each page (and the form XObjects it
+    draws) to find the transformation in effect at every Do.
+    """
+    sizes = {}
+
+    def walk(owner, ctm, depth):
+        resources = owner.get("/Resources")
+        xobjects = resources.get("/XObject") if resources is not None else None
+        if xobjects is None or depth > 8:
+            return
+        stack = []
+        for operands, operator in pikepdf.parse_content_stream(owner):
+            op = str(operator)
+            if op == "q":
+                stack.append(ctm)
+            elif op == "Q" and stack:
+                ctm = stack.pop()
+            elif op == "cm" and len(operands) == 6:
+                ctm = _multiply(tuple(float(value) for value in operands), ctm)
+            elif op == "Do" and operands:
+                xobject = xobjects.get(operands[0])
+                if not isinstance(xobject, pikepdf.Stream):
+                    continue
+                if xobject.get("/Subtype") == Name.Image:
+                    a, b, c, d = ctm[:4]
+                    width_in = math.hypot(a, b) / 72
+                    height_in = math.hypot(c, d) / 72
+                    old_width, old_height = sizes.get(xobject.objgen, (0, 0))
+                    sizes[xobject.objgen] = (max(old_width, width_in), max(old_height, height_in))
+                elif xobject.get("/Subtype") == Name.Form:
+                    matrix = tuple(float(value) for value in xobject.get("/Matrix", [1, 0, 0, 1, 0, 0]))
+                    walk(xobject, _multiply(matrix, ctm), depth + 1)
+
+    for page in pdf.pages:
+        walk(page.obj, (1, 0, 0, 1, 0, 0), 0)
+    return sizes
+
+
+def _downsample_image(image, target_width, target_height, quality):
+    """Replace an image stream with a smaller version; returns True if it was replaced"""
+    if image.get("/ImageMask", False) or "/Decode" in image or image.get("/BitsPerComponent") != 8:
+        return False
+    try:
+        pil_image = PdfImage(image).as_pil_image()
+    except Exception:
+        # Colour spaces or filters Pillow cannot decode are left alone
+        return False
+    if pil_image.mode not in ("RGB", "L"):
+        return False
+
+    resized = pil_image.resize((target_width, target_height), PILImage.Resampling.LANCZOS)
+    color_space = Name.DeviceRGB if resized.mode == "RGB" else Name.DeviceGray
+    if image.get("/Filter") == Name.DCTDecode:
+        # Photos stay JPEG
+        buffer = io.BytesIO()
+        resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+        data, filter_name = buffer.getvalue(), Name.DCTDecode
+    else:
+        # Drawings and anything else stay lossless
+        data, filter_name = zlib.compress(resized.tobytes(), 9), Name.FlateDecode
+
+    if len(data) >= len(image.read_raw_bytes()):
+        return False
+
+    image.write(data, filter=filter_name)
+    image.Width = target_width
+    image.Height = target_height
+    image.ColorSpace = color_space
+    image.BitsPerComponent = 8
+    if "/DecodeParms" in image:
+        del image["/DecodeParms"]
+    return True
+
+
+def downsample_images(pdf, quality):
+    """Downsample images drawn at more than quality.target_dpi; returns the number changed"""
+    if quality.target_dpi is None:
+        return 0
+    sizes = image_display_sizes(pdf)
+    downsampled = 0
+    for xobjects in _xobject_dicts(pdf):
+        for name in list(xobjects.keys()):
+            image = xobjects[name]
+            if not _is_image(image) or image.objgen not in sizes:
+                continue
+            width_in, height_in = sizes.pop(image.objgen)
+            target_width = max(1, round(width_in * quality.target_dpi))
+            target_height = max(1, round(height_in * quality.target_dpi))
+            if int(image.Width) < target_width * DOWNSAMPLE_THRESHOLD or \
+                    int(image.Height) < target_height * DOWNSAMPLE_THRESHOLD:
+                continue
+            if _downsample_image(image, target_width, target_height, quality.jpeg_quality):
+                downsampled += 1
+    return downsampled
+
+
+def optimize_pdf(pdf_path, quality=DEFAULT_PDF_QUALITY):
+    """
+    Optimise a PDF in place and return an OptimizationResult
+
+    quality is a key of PDF_QUALITIES or a PdfQuality. The original file is
+    only replaced once the optimised copy has been written completely.
+    Linearisation adds a little overhead, so an already compact file may
+    grow slightly; saved_bytes is negative in that case.
+    """
+    if isinstance(quality, str):
+        quality = PDF_QUALITIES[quality]
+
+    start = time.perf_counter()
+    original_size = os.path.getsize(pdf_path)
+    temp_path = pdf_path + ".optimizing"
+
+    try:
+        with pikepdf.open(pdf_path) as pdf:
+            duplicate_images = dedupe_images(pdf)
+            downsampled_images = downsample_images(pdf, quality)
+            pdf.save(
+                temp_path,
+                linearize=True,
+                compress_streams=True,
+                recompress_flate=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            )
+
+        optimized_size = os.path.getsize(temp_path)
+        os.replace(temp_path, pdf_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return OptimizationResult(
+        original_size=original_size,
+        optimized_size=optimized_size,
+        duration=time.perf_counter() - start,
+        duplicate_images=duplicate_images,
+        downsampled_images=downsampled_images,
+    )
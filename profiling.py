@@ -0,0 +1,263 @@
+"""
+Opt-in per-stage profiling for process_excel_file
+
+When profiling is off the pipeline uses NULL_PROFILER, whose stage() is a
+shared no-op context manager, so the disabled cost is one method call per
+stage.
+"""
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime
+
+
+_PROFILER_FILE = os.path.abspath(__file__)
+
+
+class NullProfiler:
+    """Profiler used when profiling is disabled"""
+
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def thread_profile(self):
+        return None
+
+    def finish(self):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class StageStats:
+    """Accumulated measurements for one named stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.thread_profiles = []
+        self.calls = 0
+        self.elapsed = 0.0
+        self.memory_delta = 0
+        self.memory_peak = 0
+        self.top_allocations = []
+
+    def merged_stats(self):
+        """pstats.Stats of the stage, including the work it ran on other threads"""
+        merged = pstats.Stats(self.profile)
+        for profile in self.thread_profiles:
+            profile.create_stats()
+            if profile.stats:
+                merged.add(profile)
+        return merged
+
+
+class RunProfiler:
+    """
+    Profile each stage of a run with cProfile and tracemalloc
+
+    Stages may nest (e.g. add_image_to_sheet inside create_sheets). CPU
+    profiles are exclusive: the outer stage's profiler is paused while an
+    inner stage runs. Wall time and memory are inclusive. Allocation sites
+    are taken from the first call of each stage, because snapshots are too
+    expensive to take for every image.
+
+    cProfile only sees the thread it was enabled on. Work a stage hands to
+    another thread (e.g. the PDF export on a renderer thread) is recorded
+    with a profile from thread_profile() and merged into the stage's
+    report, next to the time the stage spent waiting for it. Memory is
+    tracked for all threads.
+
+    Writes to a timestamped folder inside profile_dir:
+    - <stage>.pstats: cProfile stats, readable with pstats or snakeviz
+    - stages.collapsed: collapsed stacks for flamegraph.pl / speedscope
+    - summary.txt: time, memory and top allocation sites per stage
+    """
+
+    def __init__(self, profile_dir, top_allocations=10):
+        self.run_dir = os.path.join(profile_dir, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.top_allocations = top_allocations
+        self.stages = {}
+        self._stack = []
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        print(f"Profiling enabled, reports will be written to: {self.run_dir}")
+
+    def _fold_peak(self):
+        """Credit the peak since the last stage boundary to every active stage"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for stats in self._stack:
+            stats.memory_peak = max(stats.memory_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    def stage(self, name):
+        """Return a context manager that profiles the code inside it as stage name"""
+        return _Stage(self, name)
+
+    def thread_profile(self):
+        """Return a cProfile.Profile for work the current stage runs on another thread"""
+        if not self._stack:
+            return None
+        profile = cProfile.Profile()
+        self._stack[-1].thread_profiles.append(profile)
+        return profile
+
+    def finish(self):
+        """Write all reports and return the run folder"""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        collapsed_lines = []
+        for stats in self.stages.values():
+            merged = stats.merged_stats()
+            merged.dump_stats(os.path.join(self.run_dir, f"{stats.name}.pstats"))
+            collapsed_lines.extend(collapse_stacks(merged, stats.name))
+
+        with open(os.path.join(self.run_dir, "stages.collapsed"), "w", encoding="utf-8") as f:
+            f.write("\n".join(collapsed_lines) + "\n")
+
+        with open(os.path.join(self.run_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(self.summary())
+
+        print(f"Profiling reports written to: {self.run_dir}")
+        return self.run_dir
+
+    def summary(self):
+        """Return the per-stage time, memory and allocation report"""
+        lines = []
+        for stats in self.stages.values():
+            lines.append(f"{stats.name}: {stats.calls} calls, {stats.elapsed:.3f} s wall, "
+                         f"net {format_bytes(stats.memory_delta)}, peak {format_bytes(stats.memory_peak)}")
+            for difference in stats.top_allocations:
+                frame = difference.traceback[0]
+                lines.append(f"    {format_bytes(difference.size_diff):>10} {difference.count_diff:>+8} blocks  "
+                             f"{frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+
+class _Stage:
+    """
+    Context manager returned by RunProfiler.stage()
+
+    A class rather than @contextmanager, so every frame the profiler adds
+    to a profile is in this file and collapse_stacks() can drop them.
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        stats = profiler.stages.get(self.name)
+        if stats is None:
+            stats = profiler.stages[self.name] = StageStats(self.name)
+
+        if profiler._stack:
+            profiler._stack[-1].profile.disable()
+        profiler._fold_peak()
+        self.stats = stats
+        self.before_snapshot = profiler._snapshot() if stats.calls == 0 else None
+        self.memory_before = tracemalloc.get_traced_memory()[0]
+        profiler._stack.append(stats)
+        self.start = time.perf_counter()
+        stats.profile.enable()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        profiler = self.profiler
+        stats = self.stats
+        stats.profile.disable()
+        stats.elapsed += time.perf_counter() - self.start
+        stats.memory_delta += tracemalloc.get_traced_memory()[0] - self.memory_before
+        profiler._fold_peak()
+        profiler._stack.pop()
+        stats.calls += 1
+        if self.before_snapshot is not None:
+            differences = profiler._snapshot().compare_to(self.before_snapshot, 'lineno')
+            stats.top_allocations = differences[:profiler.top_allocations]
+        if profiler._stack:
+            profiler._stack[-1].profile.enable()
+        return False
+
+
+def format_bytes(size):
+    """Format a byte count like 12.3 MiB"""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _frame_label(func):
+    filename, lineno, name = func
+    if filename == "~":
+        label = name
+    else:
+        label = f"{os.path.basename(filename)}:{lineno}({name})"
+    return label.replace(";", ",").replace(" ", "_")
+
+
+def _is_profiler_frame(func):
+    return os.path.abspath(func[0]) == _PROFILER_FILE
+
+
+def collapse_stacks(profile, root_name, max_depth=64, min_microseconds=1):
+    """
+    Convert a cProfile call graph (a Profile or pstats.Stats) into collapsed stack lines ("a;b;c 123")
+
+    cProfile only records caller/callee pairs, so the time of a function
+    reached through several callers is split in proportion to the time
+    spent on each edge. Values are in microseconds. The profiler's own
+    frames (entering and leaving stages) and the calls they make are left
+    out.
+    """
+    stats = (profile if isinstance(profile, pstats.Stats) else pstats.Stats(profile)).stats
+    children = {}
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if _is_profiler_frame(func) or (callers and all(_is_profiler_frame(caller) for caller in callers)):
+            continue
+        known_callers = [caller for caller in callers if caller in stats and not _is_profiler_frame(caller)]
+        if not known_callers:
+            roots.append(func)
+        for caller in known_callers:
+            edge_cumtime = callers[caller][3]
+            children.setdefault(caller, []).append((func, edge_cumtime))
+
+    lines = []
+
+    def walk(func, path, labels, fraction):
+        _, _, tottime, cumtime, _ = stats[func]
+        self_time = int(tottime * fraction * 1_000_000)
+        if self_time >= min_microseconds:
+            lines.append(f"{';'.join(labels)} {self_time}")
+        if len(path) >= max_depth:
+            return
+        for child, edge_cumtime in children.get(func, []):
+            child_cumtime = stats[child][3]
+            if child in path or child_cumtime <= 0:
+                continue
+            child_fraction = min(1.0, fraction * edge_cumtime / child_cumtime)
+            if child_cumtime * child_fraction * 1_000_000 < min_microseconds:
+                continue
+            walk(child, path | {child}, labels + [_frame_label(child)], child_fraction)
+
+    for root in roots:
+        walk(root, {root}, [root_name, _frame_label(root)], 1.0)
+    return lines
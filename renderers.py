@@ -0,0 +1,414 @@
+"""
+Renderers turn a saved workbook into a PDF
+
+Every render session owns one backend instance and one dedicated thread.
+All calls to the backend happen on that thread, which is what COM
+requires, and the caller only waits for a job with a timeout. This means
+a hung Excel can be killed instead of blocking the caller forever.
+RendererPool starts sessions on demand, reuses them across jobs,
+health-checks them before each job and recycles them after a number of
+jobs or after any error.
+"""
+import atexit
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import count
+
+
+class RendererError(Exception):
+    """Raised when a PDF cannot be rendered"""
+
+
+class Renderer:
+    """
+    Interface for PDF backends
+
+    start(), export_pdf(), is_healthy() and close() are always called on
+    the session's own thread. kill() is called from another thread when
+    the session thread is stuck, so it must not touch thread-bound state.
+    """
+
+    name = "renderer"
+
+    def start(self):
+        """Start the backend (e.g. launch the application)"""
+
+    def export_pdf(self, excel_file_path, output_pdf, sheet_names):
+        """Write the given sheets of the workbook, in workbook order, to output_pdf"""
+        raise NotImplementedError
+
+    def is_healthy(self):
+        """Return False if the backend can no longer be used"""
+        return True
+
+    def close(self):
+        """Shut the backend down cleanly"""
+
+    def kill(self):
+        """Forcefully stop a backend that is not responding"""
+
+
+class ExcelRenderer(Renderer):
+    """Render with Excel's ExportAsFixedFormat through COM automation"""
+
+    name = "excel"
+
+    def __init__(self):
+        self.app = None
+        self.pid = None
+
+    def start(self):
+        # Imported here so other backends work without pywin32
+        import pythoncom
+        import win32com.client
+        import win32process
+
+        pythoncom.CoInitialize()
+        # DispatchEx always starts a new Excel process, so sessions never share one
+        self.app = win32com.client.DispatchEx("Excel.Application")
+        self.app.Visible = False
+        self.app.DisplayAlerts = False
+        # Files the user opens from Explorer must not land in this hidden instance,
+        # where the health check would find them and the pool would kill Excel.
+        # Excel saves this option on exit, so close() switches it back off
+        self.app.IgnoreRemoteRequests = True
+        _, self.pid = win32process.GetWindowThreadProcessId(self.app.Hwnd)
+        print(f"Started Excel renderer (pid {self.pid})")
+
+    def is_healthy(self):
+        try:
+            # A workbook left open means the previous job did not clean up
+            return self.app is not None and self.app.Workbooks.Count == 0
+        except Exception:
+            return False
+
+    def export_pdf(self, excel_file_path, output_pdf, sheet_names):
+        included = set(sheet_names)
+        workbook = self.app.Workbooks.Open(excel_file_path)
+        try:
+            # Hide sheets that should not be included in PDF
+            for sheet in workbook.Sheets:
+                if sheet.Name not in included:
+                    sheet.Visible = False
+                    print(f"Hidden sheet: {sheet.Name}")
+
+            # Export to PDF (only visible sheets will be included)
+            workbook.ExportAsFixedFormat(
+                Type=0,  # PDF
+                Filename=output_pdf,
+                Quality=0,
+                IncludeDocProperties=True,
+                IgnorePrintAreas=False,
+                OpenAfterPublish=False
+            )
+        finally:
+            # Sheets were only hidden in this copy, so it is closed without saving
+            workbook.Close(SaveChanges=False)
+
+    def close(self):
+        import pythoncom
+
+        try:
+            if self.app is not None:
+                self.app.IgnoreRemoteRequests = False
+                self.app.Quit()
+        finally:
+            self.app = None
+            pythoncom.CoUninitialize()
+
+    def kill(self):
+        if self.pid:
+            try:
+                os.kill(self.pid, signal.SIGTERM)
+                print(f"Killed Excel renderer (pid {self.pid})")
+            except OSError as e:
+                print(f"Warning: Could not kill Excel renderer (pid {self.pid}): {e}")
+
+
+class StubRenderer(Renderer):
+    """
+    Local stand-in that writes a simple PDF with one page per sheet name
+
+    Needs neither Windows nor Excel. delay simulates a slow renderer and
+    exports records every job, which makes it useful for tests.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.exports = []
+        self.closed = False
+
+    def is_healthy(self):
+        return not self.closed
+
+    def export_pdf(self, excel_file_path, output_pdf, sheet_names):
+        if self.delay:
+            time.sleep(self.delay)
+        write_text_pdf(output_pdf, [f"{os.path.basename(excel_file_path)} - {name}" for name in sheet_names])
+        self.exports.append((excel_file_path, output_pdf, list(sheet_names)))
+
+    def close(self):
+        self.closed = True
+
+    def kill(self):
+        self.closed = True
+
+
+def write_text_pdf(path, lines):
+    """Write a minimal PDF with one line of text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for line in lines or [""]:
+        text = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        content = f"BT /F1 14 Tf 72 770 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(content.encode('latin-1', 'replace'))} >>\nstream\n{content}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1", "replace")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def run_profiled(profile, function, *args):
+    """Call function with profile (a cProfile.Profile or None) enabled on the current thread"""
+    if profile is None:
+        return function(*args)
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+ profiles all threads with the caller's profiler, which is already active
+        return function(*args)
+    try:
+        return function(*args)
+    finally:
+        profile.disable()
+
+
+RENDERERS = {
+    "excel": ExcelRenderer,
+    "stub": StubRenderer,
+}
+
+
+class RenderSession:
+    """One renderer plus the thread that every call to it runs on"""
+
+    _ids = count(1)
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.session_id = next(self._ids)
+        self.jobs = 0
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix=f"{renderer.name}-renderer-{self.session_id}")
+
+    def call(self, function, *args, timeout=None):
+        """Run function on the session thread; raises TimeoutError if it takes too long"""
+        return self._executor.submit(function, *args).result(timeout)
+
+    def close(self, timeout):
+        """Close the renderer cleanly, killing it if that fails or hangs"""
+        try:
+            self.call(self.renderer.close, timeout=timeout)
+        except Exception as e:
+            print(f"Warning: Renderer session {self.session_id} did not close cleanly: {e}")
+            self.renderer.kill()
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def kill(self):
+        """Kill the renderer without waiting for the (possibly stuck) session thread"""
+        self.renderer.kill()
+        self._executor.shutdown(wait=False)
+
+
+class RendererPool:
+    """
+    Pool of reusable render sessions
+
+    Args:
+        renderer_factory: Callable returning a new Renderer
+        size (int): Maximum number of sessions running at once
+        max_jobs_per_session (int): Jobs after which a session is recycled
+        job_timeout (float): Seconds an export may take before its renderer is killed
+        start_timeout (float): Seconds a renderer may take to start or close
+        health_timeout (float): Seconds a health check may take
+    """
+
+    def __init__(self, renderer_factory, size=1, max_jobs_per_session=25, job_timeout=900.0,
+                 start_timeout=120.0, health_timeout=15.0):
+        self.renderer_factory = renderer_factory
+        self.size = size
+        self.max_jobs_per_session = max_jobs_per_session
+        self.job_timeout = job_timeout
+        self.start_timeout = start_timeout
+        self.health_timeout = health_timeout
+        self._idle = []
+        self._sessions = set()
+        self._live = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _start_session(self):
+        session = RenderSession(self.renderer_factory())
+        try:
+            session.call(session.renderer.start, timeout=self.start_timeout)
+        except Exception:
+            session.kill()
+            raise
+        return session
+
+    def _acquire(self):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RendererError("Renderer pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._live < self.size:
+                    self._live += 1
+                    break
+                self._condition.wait()
+        try:
+            session = self._start_session()
+        except Exception as e:
+            with self._condition:
+                self._live -= 1
+                self._condition.notify()
+            raise RendererError(f"Could not start renderer: {e}") from e
+
+        with self._condition:
+            self._sessions.add(session)
+            closed = self._closed
+        if closed:
+            self._discard(session, kill=True)
+            raise RendererError("Renderer pool is closed")
+        return session
+    def _release(self, session):
+        with self._condition:
+            if not self._closed and session.jobs < self.max_jobs_per_session:
+                self._idle.append(session)
+                self._condition.notify()
+                return
+        if session.jobs >= self.max_jobs_per_session:
+            print(f"Recycling renderer session {session.session_id} after {session.jobs} jobs")
+        self._discard(session)
+
+    def _discard(self, session, kill=False):
+        with self._condition:
+            if session not in self._sessions:
+                # Already killed by close() while its job was running
+                return
+            self._sessions.remove(session)
+        if kill:
+            session.kill()
+        else:
+            session.close(self.start_timeout)
+        with self._condition:
+            self._live -= 1
+            self._condition.notify()
+
+    def _is_healthy(self, session):
+        try:
+            return session.call(session.renderer.is_healthy, timeout=self.health_timeout)
+        except Exception:
+            return False
+
+    def export_pdf(self, excel_file_path, output_pdf, sheet_names, profile=None):
+        """
+        Render a workbook to PDF on a pooled session
+
+        profile is an optional cProfile.Profile that records the export on
+        the session thread, since a profiler running in the caller only sees
+        it waiting for the job.
+        """
+        session = self._acquire()
+        while not self._is_healthy(session):
+            print(f"Renderer session {session.session_id} failed its health check, replacing it")
+            self._discard(session, kill=True)
+            session = self._acquire()
+
+        try:
+            session.call(run_profiled, profile, session.renderer.export_pdf, excel_file_path, output_pdf,
+                         sheet_names, timeout=self.job_timeout)
+        except FutureTimeoutError:
+            self._discard(session, kill=True)
+            raise RendererError(f"Renderer did not finish within {self.job_timeout:g} s and was killed")
+        except Exception:
+            # The backend may be in an unknown state after a failed job
+            self._discard(session)
+            raise
+
+        session.jobs += 1
+        self._release(session)
+
+    def close(self):
+        """
+        Close idle sessions and kill busy ones
+
+        A busy session's job may never finish, e.g. when the GUI terminates
+        the processing thread on exit, so its renderer is killed rather than
+        left running. The job then fails with an error.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            busy = [session for session in self._sessions if session not in idle]
+            self._condition.notify_all()
+        for session in idle:
+            self._discard(session)
+        for session in busy:
+            print(f"Killing busy renderer session {session.session_id}")
+            self._discard(session, kill=True)
+
+
+def create_pool(backend="excel", **kwargs):
+    """Create a RendererPool for one of the RENDERERS backends"""
+    try:
+        renderer_class = RENDERERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown renderer '{backend}', expected one of: {', '.join(RENDERERS)}")
+    return RendererPool(renderer_class, **kwargs)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Return the shared Excel renderer pool, creating it on first use"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = create_pool("excel")
+        return _default_pool
+
+
+def shutdown_default_pool():
+    """Close the shared pool so no Excel process outlives the application"""
+    global _default_pool
+    with _default_pool_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(shutdown_default_pool)
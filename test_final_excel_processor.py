@@ -0,0 +1,311 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+import openpyxl.workbook.child
+from openpyxl import Workbook, load_workbook
+from PIL import Image as PILImage
+
+import final_excel_processor
+from final_excel_processor import (PreflightError, build_image_index, create_sheets, map_sheet_names,
+                                   new_detached_sheet, process_excel_file, read_schedule_ids, resolve_image,
+                                   run_preflight)
+from renderers import create_pool
+
+
+def build_workbook(sheet_ids):
+    """Build a workbook with a Template_EN sheet and a Schedule listing sheet_ids"""
+    wb = Workbook()
+    cover = wb.active
+    cover.title = "Cover"
+
+    template = wb.create_sheet("Template_EN")
+    template["A1"] = "Specification"
+    template["B3"] = "LC-01"
+    template["B4"] = "Description"
+
+    schedule = wb.create_sheet("Schedule")
+    schedule.cell(row=9, column=1, value="ID")
+    schedule.cell(row=9, column=2, value="Name")
+    for offset, sheet_id in enumerate(sheet_ids):
+        schedule.cell(row=11 + offset, column=1, value=sheet_id)
+        schedule.cell(row=11 + offset, column=2, value=f"Fixture {offset}")
+    return wb
+
+
+def run_create_sheets(wb):
+    """Run create_sheets with image loading and saving stubbed out; returns the sheet names"""
+    with mock.patch.object(final_excel_processor, "add_image_to_sheet", return_value=True), \
+            mock.patch.object(wb, "save"), \
+            contextlib.redirect_stdout(io.StringIO()):
+        sheet_names, saved_path = create_sheets(wb, "unused.xlsx", "EN", tempfile.gettempdir())
+    assert saved_path == "unused.xlsx"
+    return sheet_names
+
+
+class TestMapSheetNames(unittest.TestCase):
+    """Tests for the ID -> sheet name mapping"""
+
+    def test_short_unique_ids_are_unchanged(self):
+        self.assertEqual(map_sheet_names(["LC-01", "LC-02", "LW-01"]), ["LC-01", "LC-02", "LW-01"])
+
+    def test_long_ids_are_truncated(self):
+        long_id = "LC-" + "X" * 40
+        self.assertEqual(map_sheet_names([long_id]), [long_id[:31]])
+
+    def test_truncation_collisions_get_suffixes(self):
+        base = "A" * 40
+        names = map_sheet_names([base + "1", base + "2", base + "3"])
+        self.assertEqual(names, ["A" * 31, "A" * 29 + "~2", "A" * 29 + "~3"])
+        self.assertTrue(all(len(name) <= 31 for name in names))
+
+    def test_reserved_names_get_suffixes(self):
+        self.assertEqual(map_sheet_names(["Schedule", "LC-01"], ["Schedule", "Cover"]), ["Schedule~2", "LC-01"])
+
+    def test_clashes_are_case_insensitive(self):
+        self.assertEqual(map_sheet_names(["LC-01", "lc-01"]), ["LC-01", "lc-01~2"])
+        self.assertEqual(map_sheet_names(["schedule"], ["Schedule"]), ["schedule~2"])
+
+    def test_empty_ids_map_to_none(self):
+        self.assertEqual(map_sheet_names(["", "LC-01"]), [None, "LC-01"])
+
+    def test_mapping_is_stable(self):
+        ids = ["B" * 35 + str(i % 3) for i in range(10)] + ["LC-01", "Cover"]
+        self.assertEqual(map_sheet_names(ids, ["Cover"]), map_sheet_names(list(ids), ["Cover"]))
+
+
+class TestImageLookup(unittest.TestCase):
+    """Tests for build_image_index and resolve_image"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.img_dir = self._tmp.name
+
+    def touch(self, *file_names):
+        for file_name in file_names:
+            open(os.path.join(self.img_dir, file_name), "wb").close()
+
+    def resolve_both(self, sheet_id):
+        """Resolve with and without an index; both lookups must agree"""
+        without_index = resolve_image(sheet_id, self.img_dir)
+        with_index = resolve_image(sheet_id, self.img_dir, build_image_index(self.img_dir))
+        self.assertEqual(with_index, without_index)
+        return with_index
+
+    def expected(self, file_name, kind):
+        return os.path.join(self.img_dir, file_name), kind
+
+    def test_lookup_order(self):
+        self.touch("LC-01_image.jpg", "LC-01_dimensions.jpg", "LC-02_dimensions.jpg", "_no_image.jpg", "_blank.jpg")
+        self.assertEqual(self.resolve_both("LC-01"), self.expected("LC-01_image.jpg", 'image'))
+        self.assertEqual(self.resolve_both("LC-02"), self.expected("LC-02_dimensions.jpg", 'dimensions'))
+        self.assertEqual(self.resolve_both("LC-03"), self.expected("_no_image.jpg", 'fallback'))
+
+    def test_blank_is_the_last_fallback(self):
+        self.touch("_blank.jpg")
+        self.assertEqual(self.resolve_both("LC-01"), self.expected("_blank.jpg", 'fallback'))
+
+    def test_missing_image(self):
+        self.touch("LC-02_image.jpg")
+        self.assertEqual(self.resolve_both("LC-01"), (None, 'missing'))
+
+    def test_index_lists_files_only(self):
+        self.touch("LC-01_image.jpg")
+        os.mkdir(os.path.join(self.img_dir, "LC-02_image.jpg"))
+        self.assertEqual(build_image_index(self.img_dir), {os.path.normcase("LC-01_image.jpg")})
+
+    def test_index_of_missing_directory_is_empty(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            index = build_image_index(os.path.join(self.img_dir, "missing"))
+        self.assertEqual(index, set())
+
+
+class TestReadScheduleIds(unittest.TestCase):
+    """Tests for read_schedule_ids"""
+
+    def read_ids(self, wb):
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            path = os.path.join(tmp, "book.xlsx")
+            wb.save(path)
+            return read_schedule_ids(path)
+
+    def test_ids_are_cleaned(self):
+        self.assertEqual(self.read_ids(build_workbook(["LC-01", " LC-02? ", "LW/01"])), ["LC-01", "LC-02", "LW01"])
+
+    def test_stops_at_first_blank_id(self):
+        self.assertEqual(self.read_ids(build_workbook(["LC-01", "LC-02", "  ", "LC-03"])), ["LC-01", "LC-02"])
+
+    def test_missing_schedule(self):
+        wb = build_workbook(["LC-01"])
+        wb.remove(wb["Schedule"])
+        self.assertEqual(self.read_ids(wb), [])
+
+
+class TestPreflightIds(unittest.TestCase):
+    """Tests for the ID checks in run_preflight"""
+
+    def id_issues(self, sheet_ids):
+        wb = build_workbook(sheet_ids)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run_preflight(wb, "EN", tempfile.gettempdir())
+        return [issue for issue in report.issues if issue.check == 'ids']
+
+    def test_ids_equal_after_clean_up_are_errors(self):
+        issues = self.id_issues(["LC-01", "LC-01?"])
+        self.assertEqual([(issue.severity, issue.row) for issue in issues], [('error', 12)])
+
+    def test_ids_differing_only_in_case_are_errors(self):
+        issues = self.id_issues(["LC-01", "lc-01"])
+        self.assertEqual([(issue.severity, issue.row) for issue in issues], [('error', 12)])
+
+    def test_exact_duplicates_are_errors(self):
+        issues = self.id_issues(["LC-01", "LC-02", "LC-01"])
+        self.assertEqual([(issue.severity, issue.row) for issue in issues], [('error', 13)])
+
+    def test_truncated_ids_are_warnings(self):
+        base = "A" * 40
+        issues = self.id_issues([base + "1", base + "2"])
+        self.assertEqual([issue.severity for issue in issues], ['warning', 'warning'])
+
+
+class TestCreateSheets(unittest.TestCase):
+    """Tests for create_sheets"""
+
+    def test_sheets_follow_schedule_order(self):
+        wb = build_workbook(["LC-02", "LC-01", "LW-01"])
+        sheet_names = run_create_sheets(wb)
+        self.assertEqual(sheet_names, ["LC-02", "LC-01", "LW-01"])
+        self.assertEqual(wb.sheetnames, ["Cover", "Template_EN", "Schedule", "LC-02", "LC-01", "LW-01"])
+        self.assertEqual(wb["LC-01"]["B3"].value, "LC-01")
+        self.assertEqual(wb["LC-01"]["B4"].value, "Description")
+
+    def test_existing_sheets_are_recreated_in_schedule_order(self):
+        wb = build_workbook(["LC-01", "LC-02"])
+        run_create_sheets(wb)
+        wb["LC-01"]["B4"] = "Stale"
+        sheet_names = run_create_sheets(wb)
+        self.assertEqual(sheet_names, ["LC-01", "LC-02"])
+        self.assertEqual(wb.sheetnames, ["Cover", "Template_EN", "Schedule", "LC-01", "LC-02"])
+        self.assertEqual(wb["LC-01"]["B4"].value, "Description")
+
+    def test_created_sheets_survive_save_and_load(self):
+        wb = build_workbook(["LC-01", "LT-01"])
+        with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.xlsx")
+            with mock.patch.object(final_excel_processor, "add_image_to_sheet", return_value=True):
+                create_sheets(wb, path, "EN", tmp)
+            reloaded = load_workbook(path)
+            self.assertEqual(reloaded.sheetnames[-2:], ["LC-01", "LT-01"])
+            self.assertEqual(reloaded["LT-01"]["B3"].value, "LT-01")
+
+    def test_preflight_data_is_reused(self):
+        wb = build_workbook(["LC-01", "LC-02"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run_preflight(wb, "EN", tempfile.gettempdir())
+        self.assertEqual([row_num for row_num, _ in report.schedule_rows], [11, 12])
+        with mock.patch.object(final_excel_processor, "read_schedule", side_effect=AssertionError), \
+                mock.patch.object(final_excel_processor, "build_image_index", side_effect=AssertionError), \
+                mock.patch.object(final_excel_processor, "add_image_to_sheet", return_value=True), \
+                mock.patch.object(wb, "save"), \
+                contextlib.redirect_stdout(io.StringIO()):
+            created = create_sheets(wb, "unused.xlsx", "EN", tempfile.gettempdir(),
+                                    schedule_rows=report.schedule_rows, image_index=report.image_index)
+        self.assertEqual(created, (["LC-01", "LC-02"], "unused.xlsx"))
+
+    def test_failed_save_falls_back_to_a_copy(self):
+        wb = build_workbook(["LC-01", "LC-02"])
+        saved_paths = []
+
+        def save(path):
+            if not saved_paths:
+                saved_paths.append(None)
+                raise PermissionError("The file is open in Excel")
+            saved_paths.append(path)
+
+        with mock.patch.object(final_excel_processor, "add_image_to_sheet", return_value=True), \
+                mock.patch.object(wb, "save", side_effect=save), \
+                contextlib.redirect_stdout(io.StringIO()):
+            sheet_names, saved_path = create_sheets(wb, "book.xlsx", "EN", tempfile.gettempdir())
+        self.assertEqual(sheet_names, ["LC-01", "LC-02"])
+        self.assertEqual(saved_paths, [None, saved_path])
+        self.assertTrue(saved_path.startswith("book_modified_"), saved_path)
+
+    def test_pdf_is_rendered_from_the_fallback_copy(self):
+        original_save = Workbook.save
+
+        def save(wb, path):
+            if path == excel_path:
+                raise PermissionError("The file is open in Excel")
+            original_save(wb, path)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            excel_path = os.path.join(tmp, "book.xlsx")
+            build_workbook(["LC-01", "LC-02"]).save(excel_path)
+            PILImage.new("RGB", (20, 20)).save(os.path.join(tmp, "_no_image.jpg"))
+            pool = create_pool("stub")
+            self.addCleanup(pool.close)
+            with mock.patch.object(Workbook, "save", save), contextlib.redirect_stdout(io.StringIO()):
+                pdf_path = process_excel_file(excel_path, "EN", tmp, pdf_quality=None, render_pool=pool)
+            self.assertTrue(pdf_path, "processing failed")
+            self.assertTrue(os.path.basename(pdf_path).startswith("book_modified_"), pdf_path)
+            self.assertTrue(os.path.exists(pdf_path))
+
+    def test_rejected_job_raises_with_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.xlsx")
+            build_workbook(["LC-01", "LC-01"]).save(path)
+            with self.assertRaises(PreflightError) as raised, contextlib.redirect_stdout(io.StringIO()):
+                process_excel_file(path, "EN", tmp, pdf_quality=None)
+            self.assertEqual(sorted(os.listdir(tmp)), ["book.xlsx"])
+        summary = raised.exception.report.summary()
+        self.assertIn("Duplicate ID 'LC-01'", summary)
+        self.assertIn("(row 12)", summary)
+
+    def test_id_matching_a_chartsheet_replaces_it(self):
+        wb = build_workbook(["LC-01", "Chart1"])
+        wb.create_chartsheet("Chart1")
+        sheet_names = run_create_sheets(wb)
+        self.assertEqual(sheet_names, ["LC-01", "Chart1"])
+        self.assertEqual(wb.sheetnames, ["Cover", "Template_EN", "Schedule", "LC-01", "Chart1"])
+        self.assertEqual(wb.chartsheets, [])
+
+    def test_detached_sheet_is_titled_without_scanning(self):
+        wb = build_workbook([])
+        sheet = new_detached_sheet(wb, "LC-01")
+        self.assertEqual(sheet.title, "LC-01")
+        self.assertIs(sheet.parent, wb)
+        self.assertNotIn("LC-01", wb.sheetnames)
+
+    def count_sheet_list_scans(self, n):
+        """Run create_sheets on n rows and count the operations that scan every sheet"""
+        wb = build_workbook([f"LC-{i:05d}" for i in range(n)])
+        calls = []
+
+        def counting(name, function):
+            def wrapper(*args, **kwargs):
+                calls.append(name)
+                return function(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(Workbook, "sheetnames", property(counting("sheetnames", Workbook.sheetnames.fget))), \
+                mock.patch.object(Workbook, "worksheets", property(counting("worksheets", Workbook.worksheets.fget))), \
+                mock.patch.object(Workbook, "index", counting("index", Workbook.index)), \
+                mock.patch.object(openpyxl.workbook.child, "avoid_duplicate_name",
+                                  counting("avoid_duplicate_name", openpyxl.workbook.child.avoid_duplicate_name)):
+            sheet_names = run_create_sheets(wb)
+        self.assertEqual(len(sheet_names), n)
+        self.assertEqual(len(wb.sheetnames), n + 3)
+        return Counter(calls)
+
+    def test_create_sheets_scales_linearly(self):
+        # Scanning the sheet list once per row makes creating n sheets quadratic,
+        # so the number of such scans must not grow with the number of rows
+        self.assertEqual(self.count_sheet_list_scans(2000), self.count_sheet_list_scans(200))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import os
+import tempfile
+import unittest
+
+import pikepdf
+from pikepdf import Name, PdfImage
+from PIL import Image as PILImage
+
+from pdf_optimizer import OptimizationResult, dedupe_images, image_display_sizes, optimize_pdf
+
+
+def jpeg_bytes(width, height):
+    """A noisy JPEG, so that downsampling it saves space"""
+    noise = PILImage.effect_noise((width, height), 64)
+    image = PILImage.merge("RGB", (noise, noise.transpose(PILImage.Transpose.FLIP_LEFT_RIGHT), noise))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def write_test_pdf(path, pages=3, image_size=(1500, 1000)):
+    """Write a PDF like Excel's export: every page embeds its own copy of one JPEG, drawn at 300x200 pt"""
+    data = jpeg_bytes(*image_size)
+    pdf = pikepdf.new()
+    for _ in range(pages):
+        page = pdf.add_blank_page(page_size=(595, 842))
+        image = pikepdf.Stream(pdf, data, Type=Name.XObject, Subtype=Name.Image, Width=image_size[0],
+                               Height=image_size[1], ColorSpace=Name.DeviceRGB, BitsPerComponent=8,
+                               Filter=Name.DCTDecode)
+        page.obj.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+        page.obj.Contents = pdf.make_stream(b"q 300 0 0 200 72 500 cm /Im0 Do Q")
+    pdf.save(path)
+
+
+def page_images(path):
+    """Return the image objects drawn on each page"""
+    with pikepdf.open(path) as pdf:
+        return [(page.obj.Resources.XObject.Im0.objgen, int(page.obj.Resources.XObject.Im0.Width),
+                 int(page.obj.Resources.XObject.Im0.Height)) for page in pdf.pages]
+
+
+def page_pixels(path):
+    with pikepdf.open(path) as pdf:
+        return PdfImage(pdf.pages[0].obj.Resources.XObject.Im0).as_pil_image().tobytes()
+
+
+class TestOptimizePdf(unittest.TestCase):
+    """Tests for the optimisation steps, on a generated PDF"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.pdf_path = os.path.join(self._tmp.name, "output.pdf")
+        write_test_pdf(self.pdf_path)
+
+    def test_identical_images_are_merged(self):
+        with pikepdf.open(self.pdf_path) as pdf:
+            self.assertEqual(dedupe_images(pdf), 2)
+            objgens = {page.obj.Resources.XObject.Im0.objgen for page in pdf.pages}
+        self.assertEqual(len(objgens), 1)
+
+    def test_display_size_follows_transformation(self):
+        with pikepdf.open(self.pdf_path) as pdf:
+            sizes = list(image_display_sizes(pdf).values())
+        self.assertEqual(len(sizes), 3)
+        for width_in, height_in in sizes:
+            self.assertAlmostEqual(width_in, 300 / 72)
+            self.assertAlmostEqual(height_in, 200 / 72)
+
+    def test_ebook_merges_downsamples_and_linearises(self):
+        result = optimize_pdf(self.pdf_path, "ebook")
+        self.assertEqual(result.duplicate_images, 2)
+        self.assertEqual(result.downsampled_images, 1)
+        self.assertGreater(result.saved_bytes, 0)
+        images = page_images(self.pdf_path)
+        self.assertEqual(len({objgen for objgen, _, _ in images}), 1)
+        # 300 pt at 150 dpi
+        self.assertEqual(images[0][1:], (625, 417))
+        with pikepdf.open(self.pdf_path) as pdf:
+            self.assertTrue(pdf.is_linearized)
+        self.assertFalse(os.path.exists(self.pdf_path + ".optimizing"))
+
+    def test_lossless_keeps_pixels(self):
+        original_pixels = page_pixels(self.pdf_path)
+        result = optimize_pdf(self.pdf_path, "lossless")
+        self.assertEqual(result.duplicate_images, 2)
+        self.assertEqual(result.downsampled_images, 0)
+        self.assertEqual(page_images(self.pdf_path)[0][1:], (1500, 1000))
+        self.assertEqual(page_pixels(self.pdf_path), original_pixels)
+
+
+class TestOptimizationResult(unittest.TestCase):
+    """Tests for the optimize_pdf() result summary"""
+
+    def test_summary_reports_smaller_file(self):
+        result = OptimizationResult(original_size=1000, optimized_size=760, duration=0.1)
+        self.assertEqual(result.saved_bytes, 240)
+        self.assertIn("(24% smaller)", result.summary())
+
+    def test_summary_reports_larger_file(self):
+        result = OptimizationResult(original_size=1000, optimized_size=1240, duration=0.1)
+        self.assertEqual(result.saved_bytes, -240)
+        self.assertIn("(24% larger)", result.summary())
+        self.assertNotIn("-24%", result.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
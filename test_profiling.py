@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from profiling import RunProfiler, collapse_stacks
+from renderers import run_profiled
+
+
+def busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+class TestRunProfiler(unittest.TestCase):
+    """Tests for RunProfiler and collapse_stacks"""
+
+    def run_profiler(self, profile_dir):
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler = RunProfiler(profile_dir)
+            with profiler.stage("outer"):
+                busy_work(20000)
+                for _ in range(3):
+                    with profiler.stage("inner"):
+                        busy_work(10000)
+            run_dir = profiler.finish()
+        return profiler, run_dir
+
+    def test_collapsed_stacks_exclude_profiler_frames(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler, _ = self.run_profiler(tmp)
+            for stats in profiler.stages.values():
+                lines = collapse_stacks(stats.profile, stats.name)
+                self.assertTrue(lines)
+                for line in lines:
+                    self.assertTrue(line.startswith(f"{stats.name};test_profiling.py:"), line)
+                    self.assertNotIn("contextlib.py", line)
+                    self.assertNotIn("profiling.py", line.replace("test_profiling.py", ""))
+
+    def test_stages_are_counted_and_reports_written(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler, run_dir = self.run_profiler(tmp)
+            self.assertEqual(os.path.dirname(run_dir), tmp)
+            self.assertEqual(profiler.stages["outer"].calls, 1)
+            self.assertEqual(profiler.stages["inner"].calls, 3)
+            self.assertEqual(sorted(os.listdir(run_dir)),
+                             ["inner.pstats", "outer.pstats", "stages.collapsed", "summary.txt"])
+
+    def test_thread_profiles_are_merged_into_stage(self):
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            profiler = RunProfiler(tmp)
+            self.assertIsNone(profiler.thread_profile())
+            with profiler.stage("create_pdf"):
+                profile = profiler.thread_profile()
+                thread = threading.Thread(target=run_profiled, args=(profile, busy_work, 10000))
+                thread.start()
+                thread.join()
+            profiler.finish()
+            lines = collapse_stacks(profiler.stages["create_pdf"].merged_stats(), "create_pdf")
+        self.assertTrue(any("(busy_work)" in line for line in lines), lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
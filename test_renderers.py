@@ -0,0 +1,132 @@
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from renderers import ExcelRenderer, RendererError, RendererPool, StubRenderer
+
+
+class FailingRenderer(StubRenderer):
+    """Stub whose exports always fail"""
+
+    def export_pdf(self, excel_file_path, output_pdf, sheet_names):
+        raise RuntimeError("export failed")
+
+
+class TestRendererPool(unittest.TestCase):
+    """Tests for RendererPool, using StubRenderer as the backend"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.output_pdf = os.path.join(self._tmp.name, "out.pdf")
+        stdout = contextlib.redirect_stdout(io.StringIO())
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+    def make_pool(self, make_renderer=StubRenderer, **kwargs):
+        """Return a pool and the list of every renderer it has created"""
+        renderers = []
+
+        def factory():
+            renderer = make_renderer()
+            renderers.append(renderer)
+            return renderer
+
+        pool = RendererPool(factory, **kwargs)
+        self.addCleanup(pool.close)
+        return pool, renderers
+
+    def export(self, pool, **kwargs):
+        pool.export_pdf("book.xlsx", self.output_pdf, ["Cover", "LC-01"], **kwargs)
+
+    def test_session_is_reused(self):
+        pool, renderers = self.make_pool()
+        for _ in range(3):
+            self.export(pool)
+        self.assertEqual(len(renderers), 1)
+        self.assertEqual(len(renderers[0].exports), 3)
+        self.assertTrue(os.path.getsize(self.output_pdf) > 0)
+
+    def test_session_is_recycled_after_max_jobs(self):
+        pool, renderers = self.make_pool(max_jobs_per_session=2)
+        for _ in range(5):
+            self.export(pool)
+        self.assertEqual([len(renderer.exports) for renderer in renderers], [2, 2, 1])
+        self.assertEqual([renderer.closed for renderer in renderers], [True, True, False])
+
+    def test_timed_out_session_is_killed(self):
+        pool, renderers = self.make_pool(lambda: StubRenderer(delay=0.5), job_timeout=0.05)
+        with self.assertRaises(RendererError):
+            self.export(pool)
+        self.assertEqual(len(renderers), 1)
+        self.assertTrue(renderers[0].closed)
+        self.assertEqual(pool._live, 0)
+
+    def test_failed_session_is_discarded(self):
+        pool, renderers = self.make_pool(FailingRenderer)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                self.export(pool)
+        self.assertEqual(len(renderers), 2)
+        self.assertTrue(all(renderer.closed for renderer in renderers))
+        self.assertEqual(pool._live, 0)
+
+    def test_unhealthy_session_is_replaced(self):
+        pool, renderers = self.make_pool()
+        self.export(pool)
+        renderers[0].closed = True
+        self.export(pool)
+        self.assertEqual(len(renderers), 2)
+        self.assertEqual(len(renderers[1].exports), 1)
+
+    def test_closed_pool_rejects_jobs(self):
+        pool, _ = self.make_pool()
+        pool.close()
+        with self.assertRaises(RendererError):
+            self.export(pool)
+
+    def test_close_kills_busy_sessions(self):
+        pool, renderers = self.make_pool(lambda: StubRenderer(delay=0.3))
+        job = threading.Thread(target=self.export, args=(pool,))
+        job.start()
+        while not pool._sessions:
+            time.sleep(0.01)
+        pool.close()
+        self.assertTrue(renderers[0].closed)
+        self.assertEqual(pool._live, 0)
+        self.assertEqual(pool._sessions, set())
+        job.join()
+        self.assertEqual(pool._live, 0)
+
+    def test_profile_records_export_on_session_thread(self):
+        pool, _ = self.make_pool()
+        profile = cProfile.Profile()
+        self.export(pool, profile=profile)
+        functions = {name for _, _, name in pstats.Stats(profile).stats}
+        self.assertIn("write_text_pdf", functions)
+
+
+class TestExcelRenderer(unittest.TestCase):
+    """Tests for ExcelRenderer that do not need Excel"""
+
+    def test_close_restores_remote_requests_before_quitting(self):
+        renderer = ExcelRenderer()
+        app = renderer.app = mock.Mock(IgnoreRemoteRequests=True)
+        settings_at_quit = []
+        app.Quit.side_effect = lambda: settings_at_quit.append(app.IgnoreRemoteRequests)
+        with mock.patch.dict(sys.modules, {"pythoncom": mock.Mock()}):
+            renderer.close()
+        self.assertEqual(settings_at_quit, [False])
+        self.assertIsNone(renderer.app)
+
+
+if __name__ == "__main__":
+    unittest.main()